@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#   The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Ahead of time compilation of the noise update kernels, so that the first
+noise realization of a session does not wait for the JIT. Build with
+
+    python -m tvb._speedups.noise_cc
+
+which writes the ``tvb._speedups.noise`` extension next to this file;
+``tvb.simulator.noise`` uses it when importable and falls back to the JIT
+kernels otherwise.
+
+"""
+
+import os
+from numba.pycc import CC
+from tvb.simulator.noise import _coloured_step, _white_step
+
+cc = CC('noise')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export('coloured_step', 'void(f8[:], f8, f8, f8, f8[:], f8[:])')(_coloured_step.py_func)
+cc.export('white_step', 'void(f8, f8[:], f8[:])')(_white_step.py_func)
+
+
+if __name__ == '__main__':
+    cc.compile()
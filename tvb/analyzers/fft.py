@@ -130,9 +130,10 @@ class FFT(core.Type):
                                             (seg_tpts, 1, 1, 1, 1))
                 time_series = time_series * window_mask
 
-        #Calculate the FFT
-        result = numpy.fft.fft(time_series, axis=0)
-        nfreq = result.shape[0] / 2
+        #Calculate the FFT; the input is real, so only the non-negative
+        #frequencies are computed, and the DC component is dropped
+        nfreq = time_series.shape[0] / 2
+        result = numpy.fft.rfft(time_series, axis=0)
         result = result[1:nfreq + 1, :]
         util.log_debug_array(LOG, result, "result")
 
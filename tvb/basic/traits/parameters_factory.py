@@ -39,17 +39,26 @@ KEYWORD_SEPARATOR = "_"
 KEYWORD_OPTION = "option_"
 
 
+# parent class -> (size of TYPE_REGISTER when walked, {class_name: sub_class})
+_SUBCLASSES_CACHE = {}
+
+
 def get_traited_subclasses(parent_class):
     """
     :param parent_class: SuperClass, to return valid sub-classes of this (e.g. Model).
     :return: {class_name: sub_class_instance}
         e.g. {'WilsonCowan': WilsonCowan, ....}
+
+    The register is only walked again once new traited classes were defined.
     """
-    classes_list = TYPE_REGISTER.subclasses(parent_class)
-    result = {}
-    for class_instance in classes_list:
-        result[class_instance.__name__] = class_instance
-    return result
+    cached = _SUBCLASSES_CACHE.get(parent_class)
+    if cached is None or cached[0] != len(TYPE_REGISTER):
+        classes_list = TYPE_REGISTER.subclasses(parent_class)
+        result = {}
+        for class_instance in classes_list:
+            result[class_instance.__name__] = class_instance
+        cached = _SUBCLASSES_CACHE[parent_class] = len(TYPE_REGISTER), result
+    return dict(cached[1])
 
 
 def get_traited_instance_for_name(class_name, parent_class, params_dictionary):
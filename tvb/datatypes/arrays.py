@@ -164,21 +164,28 @@ class MappedArray(MappedType):
         """
         return self.array_data.shape
 
+    def _set_length_attrs(self, shape):
+        """ Set `nr_dimensions` and `length_1d` .. `length_4d` from a data shape."""
+        self.nr_dimensions = len(shape)
+        if len(shape) > 0:
+            self.length_1d = int(shape[0])
+        if len(shape) > 1:
+            self.length_2d = int(shape[1])
+        if len(shape) > 2:
+            self.length_3d = int(shape[2])
+        if len(shape) > 3:
+            self.length_4d = int(shape[3])
+
     def configure_chunk_safe(self):
         """ Configure part which is chunk safe"""
-        data_shape = self.get_data_shape('array_data')
-        self.nr_dimensions = len(data_shape)
-        for i in range(min(self.nr_dimensions, 4)):
-            setattr(self, 'length_%dd' % (i + 1), int(data_shape[i]))
+        self._set_length_attrs(self.get_data_shape('array_data'))
 
     def configure(self):
         """After populating few fields, compute the rest of the fields"""
         super(MappedArray, self).configure()
         if not isinstance(self.array_data, numpy.ndarray):
             return
-        self.nr_dimensions = len(self.array_data.shape)
-        for i in range(min(self.nr_dimensions, 4)):
-            setattr(self, 'length_%dd' % (i + 1), self.array_data.shape[i])
+        self._set_length_attrs(self.array_data.shape)
 
     @staticmethod
     def accepted_filters():
@@ -49,6 +49,30 @@ LOG = get_logger(__name__)
 DEFAULT_PLOT_GRANULARITY = 1024
 
 
+def series_var(min_range=0, max_range=100, step=None):
+    """
+    Build the (1, n) grid on which equations are evaluated for plotting.
+    """
+    if step is None:
+        step = float(max_range - min_range) / DEFAULT_PLOT_GRANULARITY
+
+    var = numpy.arange(min_range, max_range+step, step)
+    return var[numpy.newaxis, :]
+
+
+def batch_series(equations, var):
+    """
+    Evaluate each of ``equations`` on the same ``var`` grid, as built by
+    :func:`series_var`, returning the list of patterns. This avoids rebuilding
+    the grid for every equation when many of them are shown together.
+    """
+    series = []
+    for equation in equations:
+        equation.pattern = var
+        series.append(equation.pattern)
+    return series
+
+
 class Equation(basic.MapAsJson, core.Type):
     "Base class for Equation data types."
 
@@ -106,24 +130,52 @@ class Equation(basic.MapAsJson, core.Type):
 
         """
 
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
+        self._pattern = self.evaluate(var)
 
     pattern = property(fget=_get_pattern, fset=_set_pattern)
 
+    def evaluate(self, var, out=None):
+        """
+        Evaluate the equation for ``var`` and return the result, without
+        keeping it on the instance. When ``out`` is given the result is
+        written into it; ``out`` may be ``var`` itself.
+        """
+        return numexpr.evaluate(self._equation_simplified(), local_dict=self._namespace(var), out=out)
+
+    def _namespace(self, var):
+        """
+        Return the mapping numexpr resolves the equation's names against: the
+        parameters plus ``var``. Handing it over as ``local_dict`` spares
+        numexpr the caller frame inspection and a failed local lookup for
+        every parameter.
+        """
+        namespace = dict(self.parameters)
+        namespace["var"] = var
+        return namespace
+
+    def _equation_simplified(self):
+        """
+        Return the expression actually handed to numexpr. When the equation
+        ends with a ``+ offset`` term and the offset parameter is zero, the
+        term is dropped, saving one full pass over ``var``. numexpr caches the
+        compiled form of both variants, keyed on the expression string.
+        """
+        if self.parameters.get("offset", None) == 0.0:
+            head, plus, tail = self.equation.rpartition("+")
+            if plus and tail.strip() == "offset":
+                return head
+        return self.equation
+
     def get_series_data(self, min_range=0, max_range=100, step=None):
         """
         NOTE: The symbol from the equation which varies should be named: var
         Returns the series data needed for plotting this equation.
         """
-        if step is None:
-            step = float(max_range - min_range) / DEFAULT_PLOT_GRANULARITY
-
-        var = numpy.arange(min_range, max_range+step, step)
-        var = var[numpy.newaxis, :]
+        var = series_var(min_range, max_range, step)
 
         self.pattern = var
         y = self.pattern
-        result = zip(var.flat, y.flat)
+        result = zip(var.ravel().tolist(), y.ravel().tolist())
         return result, False
 
     @staticmethod
@@ -366,7 +418,7 @@ class Alpha(TemporalApplicableEquation):
 
     equation = basic.String(
         label="Alpha Equation",
-        default="where((var-onset) > 0, (alpha * beta) / (beta - alpha) * (exp(-alpha * (var-onset)) - exp(-beta * (var-onset))), 0.0 * var)",
+        default="where(var > onset, (alpha * beta) / (beta - alpha) * (exp(-alpha * (var - onset)) - exp(-beta * (var - onset))), 0.0)",
         locked=True,
         doc=""":math:`(\\alpha * \\beta) / (\\beta - \\alpha) *
             (\\exp(-\\alpha * (x-onset)) - \\exp(-\\beta * (x-onset)))` for :math:`(x-onset) > 0`""")
@@ -407,13 +459,7 @@ class PulseTrain(TemporalApplicableEquation):
         default={"T": 42.0, "tau": 13.0, "amp": 1.0, "onset": 30.0},
         label="Pulse Train Parameters")
 
-    def _get_pattern(self):
-        """
-        Return a discrete representation of the equation.
-        """
-        return self._pattern
-
-    def _set_pattern(self, var):
+    def evaluate(self, var, out=None):
         """
         Generate a discrete representation of the equation for the space
         represented by ``var``.
@@ -431,10 +477,9 @@ class PulseTrain(TemporalApplicableEquation):
         off = var < onset
         var = numpy.roll(var, off.sum() + 1)
         var[..., off] = 0.0
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
-        self._pattern[..., off] = 0.0
-
-    pattern = property(fget=_get_pattern, fset=_set_pattern)
+        result = numexpr.evaluate(self.equation, local_dict=self._namespace(var), out=out)
+        result[..., off] = 0.0
+        return result
 
 
 class HRFKernelEquation(Equation):
@@ -483,13 +528,7 @@ class Gamma(HRFKernelEquation):
         label="Gamma Parameters",
         default={"tau": 1.08, "n": 3.0, "factorial": 2.0, "a": 0.1})
 
-    def _get_pattern(self):
-        """
-        Return a discrete representation of the equation.
-        """
-        return self._pattern
-
-    def _set_pattern(self, var):
+    def evaluate(self, var, out=None):
         """
         Generate a discrete representation of the equation for the space
         represented by ``var``.
@@ -505,12 +544,11 @@ class Gamma(HRFKernelEquation):
             product *= i + 1
 
         self.parameters["factorial"] = product
-        self._pattern = numexpr.evaluate(self.equation,
-                                         global_dict=self.parameters)
-        self._pattern /= max(self._pattern)
-        self._pattern *= self.parameters["a"]
-
-    pattern = property(fget=_get_pattern, fset=_set_pattern)
+        result = numexpr.evaluate(self.equation,
+                                  local_dict=self._namespace(var), out=out)
+        result /= max(result)
+        result *= self.parameters["a"]
+        return result
 
 
 class DoubleExponential(HRFKernelEquation):
@@ -552,25 +590,18 @@ class DoubleExponential(HRFKernelEquation):
                  "tau_2": 7.4, "f_2": 0.12, "amp_2": 0.1,
                  "a": 0.1, "pi": numpy.pi})
 
-    def _get_pattern(self):
-        """
-        Return a discrete representation of the equation.
-        """
-        return self._pattern
-
-    def _set_pattern(self, var):
+    def evaluate(self, var, out=None):
         """
         Generate a discrete representation of the equation for the space
         represented by ``var``.
 
         """
 
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
-        self._pattern /= max(self._pattern)
+        result = numexpr.evaluate(self.equation, local_dict=self._namespace(var), out=out)
+        result /= max(result)
 
-        self._pattern *= self.parameters["a"]
-
-    pattern = property(fget=_get_pattern, fset=_set_pattern)
+        result *= self.parameters["a"]
+        return result
 
 
 class FirstOrderVolterra(HRFKernelEquation):
@@ -674,13 +705,7 @@ class MixtureOfGammas(HRFKernelEquation):
         label="Double Exponential Parameters",
         default={"a_1": 6.0, "a_2": 13.0, "l": 1.0, "c": 0.4, "gamma_a_1": 1.0, "gamma_a_2": 1.0})
 
-    def _get_pattern(self):
-        """
-        Return a discrete representation of the equation.
-        """
-        return self._pattern
-
-    def _set_pattern(self, var):
+    def evaluate(self, var, out=None):
         """
         Generate a discrete representation of the equation for the space
         represented by ``var``.
@@ -694,6 +719,4 @@ class MixtureOfGammas(HRFKernelEquation):
         self.parameters["gamma_a_1"] = sp_gamma(self.parameters["a_1"])
         self.parameters["gamma_a_2"] = sp_gamma(self.parameters["a_2"])
 
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
-
-    pattern = property(fget=_get_pattern, fset=_set_pattern)
\ No newline at end of file
+        return numexpr.evaluate(self.equation, local_dict=self._namespace(var), out=out)
\ No newline at end of file
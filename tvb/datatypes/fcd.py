@@ -81,9 +81,7 @@ class Fcd(arrays.MappedArray):
     def configure(self):
         """After populating few fields, compute the rest of the fields"""
         # Do not call super, because that accesses data not-chunked
-        self.nr_dimensions = len(self.read_data_shape())
-        for i in range(self.nr_dimensions):
-            setattr(self, 'length_%dd' % (i + 1), int(self.read_data_shape()[i]))
+        self._set_length_attrs(self.read_data_shape())
 
 
     def _find_summary_info(self):
@@ -60,9 +60,7 @@ class Covariance(arrays.MappedArray):
     def configure(self):
         """After populating few fields, compute the rest of the fields"""
         # Do not call super, because that accesses data not-chunked
-        self.nr_dimensions = len(self.read_data_shape())
-        for i in range(self.nr_dimensions):
-            setattr(self, 'length_%dd' % (i + 1), int(self.read_data_shape()[i]))
+        self._set_length_attrs(self.read_data_shape())
 
     def write_data_slice(self, partial_result):
         """
@@ -97,9 +95,7 @@ class CorrelationCoefficients(arrays.MappedArray):
     def configure(self):
         """After populating few fields, compute the rest of the fields"""
         # Do not call super, because that accesses data not-chunked
-        self.nr_dimensions = len(self.read_data_shape())
-        for i in range(self.nr_dimensions):
-            setattr(self, 'length_%dd' % (i + 1), int(self.read_data_shape()[i]))
+        self._set_length_attrs(self.read_data_shape())
 
     def _find_summary_info(self):
         summary = {"Graph type": self.__class__.__name__,
@@ -29,16 +29,163 @@
 #
 
 
+import os
+import math
+import tempfile
+import logging
+import hashlib
 import numpy
 import scipy.sparse
+from numba import njit, prange
 from tvb.basic.readers import try_get_absolute_path, FileReader
 from tvb.basic.logger.builder import get_logger
+from tvb.basic.profile import TvbProfile
 from tvb.basic.traits import types_basic as basic, exceptions, types_mapped
 from tvb.datatypes import equations, surfaces
 
 
 LOG = get_logger(__name__)
 
+try:
+    import cupy
+    import cupyx
+except ImportError:
+    cupy = None
+
+# Below this many vertices the transfers outweigh what the GPU saves
+GPU_MIN_VERTICES = 50000
+
+# Oldest cached geodesic distance matrices are removed beyond this total size
+GDIST_CACHE_MAX_BYTES = 2 ** 30
+
+
+@njit(parallel=True)
+def _row_contributions(data, indptr):
+    """
+    Sum the positive and the negative nonzeros of each row of a CSR matrix,
+    in a single pass over ``data``.
+    """
+    nv = indptr.shape[0] - 1
+    pos_contrib = numpy.zeros(nv)
+    neg_contrib = numpy.zeros(nv)
+    for row in prange(nv):
+        pos_sum = 0.0
+        neg_sum = 0.0
+        for k in range(indptr[row], indptr[row + 1]):
+            value = data[k]
+            if value > 0.0:
+                pos_sum += value
+            elif value < 0.0:
+                neg_sum += value
+        pos_contrib[row] = pos_sum
+        neg_contrib[row] = neg_sum
+    return pos_contrib, neg_contrib
+
+
+@njit(parallel=True)
+def _scale_rows(data, indptr, pos_hf, neg_hf):
+    """
+    Scale the positive nonzeros of each row of a CSR matrix by ``pos_hf`` and
+    the negative ones by ``neg_hf`` of that row, returning the new data.
+    """
+    nv = indptr.shape[0] - 1
+    scaled = numpy.zeros(data.shape[0])
+    for row in prange(nv):
+        for k in range(indptr[row], indptr[row + 1]):
+            value = data[k]
+            if value > 0.0:
+                scaled[k] = value * pos_hf[row]
+            elif value < 0.0:
+                scaled[k] = value * neg_hf[row]
+    return scaled
+
+
+def _warn_if_too_coarse(pos_mean, neg_mean, pos_zero, neg_zero):
+    """
+    Warn when rows without positive, or negative, weights cannot be
+    homogenised. The masks are numpy or CuPy arrays.
+    """
+    if (pos_mean != 0.0 and bool(pos_zero.any())) or (neg_mean != 0.0 and bool(neg_zero.any())):
+        msg = "Cortical mesh is too coarse for requested LocalConnectivity."
+        LOG.warning(msg)
+        if LOG.isEnabledFor(logging.DEBUG):
+            bad_verts = ()
+            if pos_mean != 0.0:
+                bad_verts = bad_verts + numpy.nonzero(_to_host(pos_zero))
+            if neg_mean != 0.0:
+                bad_verts = bad_verts + numpy.nonzero(_to_host(neg_zero))
+            LOG.debug("Problem vertices are: %s" % str(bad_verts))
+
+
+def _to_host(array):
+    return array if isinstance(array, numpy.ndarray) else cupy.asnumpy(array)
+
+
+def _mean_row_sums(pos_contrib, neg_contrib):
+    """
+    The mean positive and negative row sums. They scale every row, so both
+    the CPU and the GPU homogenisation take them as exactly rounded sums.
+    """
+    return (math.fsum(pos_contrib) / pos_contrib.shape[0],
+            math.fsum(neg_contrib) / neg_contrib.shape[0])
+
+
+def _homogenise(data, indptr):
+    """
+    Scale the positive and the negative weights of each row of a CSR matrix
+    so that every row sums to the mean row sum of its sign, on the CPU.
+    """
+    pos_contrib, neg_contrib = _row_contributions(data, indptr)
+    pos_mean, neg_mean = _mean_row_sums(pos_contrib, neg_contrib)
+    pos_zero = pos_contrib == 0.0
+    neg_zero = neg_contrib == 0.0
+    _warn_if_too_coarse(pos_mean, neg_mean, pos_zero, neg_zero)
+    pos_hf = numpy.zeros_like(pos_contrib)
+    numpy.divide(pos_mean, pos_contrib, out=pos_hf, where=~pos_zero)
+    neg_hf = numpy.zeros_like(neg_contrib)
+    numpy.divide(neg_mean, neg_contrib, out=neg_hf, where=~neg_zero)
+    # Scale each row directly, the result keeps the sparsity structure of the input
+    return _scale_rows(data, indptr, pos_hf, neg_hf)
+
+
+def _gpu_homogenise(data, indptr):
+    """
+    GPU counterpart of :func:`_homogenise`. The data goes to the device
+    once and only the scaled data comes back; the row sums and scale
+    factors stay on the device. The row sums are copied to the host for
+    the same exactly rounded means as on the CPU.
+
+    The row sums are accumulated with atomic adds, in no fixed order, so
+    they, and the scaled weights, can differ from the CPU result in the
+    last bits: the two agree to a relative tolerance of 1e-12.
+    """
+    data = cupy.asarray(data)
+    indptr = cupy.asarray(indptr)
+    nv = indptr.shape[0] - 1
+    rows = cupy.searchsorted(indptr, cupy.arange(data.shape[0]), side='right') - 1
+    positive, negative = data > 0.0, data < 0.0
+    pos_contrib = cupy.zeros(nv)
+    neg_contrib = cupy.zeros(nv)
+    cupyx.scatter_add(pos_contrib, rows, cupy.where(positive, data, 0.0))
+    cupyx.scatter_add(neg_contrib, rows, cupy.where(negative, data, 0.0))
+    pos_mean, neg_mean = _mean_row_sums(cupy.asnumpy(pos_contrib), cupy.asnumpy(neg_contrib))
+    pos_zero = pos_contrib == 0.0
+    neg_zero = neg_contrib == 0.0
+    _warn_if_too_coarse(pos_mean, neg_mean, pos_zero, neg_zero)
+    pos_hf = cupy.where(pos_zero, 0.0, pos_mean / cupy.where(pos_zero, 1.0, pos_contrib))
+    neg_hf = cupy.where(neg_zero, 0.0, neg_mean / cupy.where(neg_zero, 1.0, neg_contrib))
+    scaled = cupy.where(positive, data * pos_hf[rows], cupy.where(negative, data * neg_hf[rows], 0.0))
+    return cupy.asnumpy(scaled)
+
+
+def _gpu_errors():
+    "CuPy exceptions meaning there is no usable device or CUDA runtime."
+    errors = (cupy.cuda.runtime.CUDARuntimeError, )
+    driver = getattr(cupy.cuda, 'driver', None)
+    if driver is not None and hasattr(driver, 'CUDADriverError'):
+        errors += (driver.CUDADriverError, )
+    return errors
+
 
 class LocalConnectivity(types_mapped.MappedType):
     """
@@ -62,56 +209,40 @@ class LocalConnectivity(types_mapped.MappedType):
         doc="Distance at which to truncate the evaluation in mm.",
         order=3)
 
-    def compute(self):
+    def compute(self, use_gpu=False):
         """
         Compute current Matrix.
+
+        With ``use_gpu``, and CuPy available, the homogenisation of surfaces
+        with at least ``GPU_MIN_VERTICES`` vertices runs on the GPU.
         """
         LOG.info("Mapping geodesic distance through the LocalConnectivity.")
 
-        #Start with data being geodesic_distance_matrix, then map it through equation
-        self.equation.pattern = self.matrix_gdist.data
-
-        #Then replace original data with result...
-        self.matrix_gdist.data = self.equation.pattern
+        #Start with data being geodesic_distance_matrix, then map it through equation in place
+        self.equation.evaluate(self.matrix_gdist.data, out=self.matrix_gdist.data)
 
         #Homogenise spatial discretisation effects across the surface
-        nv = self.matrix_gdist.shape[0]
-        ind = numpy.arange(nv, dtype=int)
-        pos_mask = self.matrix_gdist.data > 0.0
-        neg_mask = self.matrix_gdist.data < 0.0
-        pos_con = self.matrix_gdist.copy()
-        neg_con = self.matrix_gdist.copy()
-        pos_con.data[neg_mask] = 0.0
-        neg_con.data[pos_mask] = 0.0
-        pos_contrib = pos_con.sum(axis=1)
-        pos_contrib = numpy.array(pos_contrib).squeeze()
-        neg_contrib = neg_con.sum(axis=1)
-        neg_contrib = numpy.array(neg_contrib).squeeze()
-        pos_mean = pos_contrib.mean()
-        neg_mean = neg_contrib.mean()
-        if ((pos_mean != 0.0 and any(pos_contrib == 0.0)) or
-                (neg_mean != 0.0 and any(neg_contrib == 0.0))):
-            msg = "Cortical mesh is too coarse for requested LocalConnectivity."
-            LOG.warning(msg)
-            bad_verts = ()
-            if pos_mean != 0.0:
-                bad_verts = bad_verts + numpy.nonzero(pos_contrib == 0.0)
-            if neg_mean != 0.0:
-                bad_verts = bad_verts + numpy.nonzero(neg_contrib == 0.0)
-            LOG.debug("Problem vertices are: %s" % str(bad_verts))
-        pos_hf = numpy.zeros(shape=pos_contrib.shape)
-        pos_hf[pos_contrib != 0] = pos_mean / pos_contrib[pos_contrib != 0]
-        neg_hf = numpy.zeros(shape=neg_contrib.shape)
-        neg_hf[neg_contrib != 0] = neg_mean / neg_contrib[neg_contrib != 0]
-        pos_hf_diag = scipy.sparse.csc_matrix((pos_hf, (ind, ind)), shape=(nv, nv))
-        neg_hf_diag = scipy.sparse.csc_matrix((neg_hf, (ind, ind)), shape=(nv, nv))
-        homogenious_conn = (pos_hf_diag * pos_con) + (neg_hf_diag * neg_con)
-
-        #Then replace unhomogenised result with the spatially homogeneous one...
-        if not homogenious_conn.has_sorted_indices:
-            homogenious_conn.sort_indices()
+        gdist = self.matrix_gdist.tocsr()
+        # A no-op for the usual CSC input, whose conversion already comes out sorted
+        gdist.sort_indices()
+        homogenious_data = None
+        if use_gpu and cupy is not None and gdist.shape[0] >= GPU_MIN_VERTICES:
+            try:
+                homogenious_data = _gpu_homogenise(gdist.data, gdist.indptr)
+            except _gpu_errors() as exc:
+                LOG.warning("Homogenising local connectivity on the CPU, the GPU failed: %s" % exc)
+        elif use_gpu:
+            LOG.info("Homogenising local connectivity on the CPU, the GPU is unavailable or not worthwhile.")
+        if homogenious_data is None:
+            homogenious_data = _homogenise(gdist.data, gdist.indptr)
+        homogenious_conn = scipy.sparse.csr_matrix((homogenious_data, gdist.indices, gdist.indptr),
+                                                   shape=gdist.shape)
+        # Weights that map to 0, or rows that cannot be homogenised, are not stored
+        homogenious_conn.eliminate_zeros()
 
-        self.matrix = homogenious_conn
+        #Then replace unhomogenised result with the spatially homogeneous one,
+        #in the CSC format the matrix trait wraps
+        self.matrix = homogenious_conn.tocsc()
 
     def _validate_before_store(self):
         """
@@ -158,21 +289,110 @@ class LocalConnectivity(types_mapped.MappedType):
                                           self.METADATA_ARRAY_MEAN,
                                           self.METADATA_ARRAY_SHAPE])
 
-    def compute_sparse_matrix(self):
+    def compute_sparse_matrix(self, use_cache=False, use_gpu=False):
         """
         NOTE: Before calling this method, the surface field
         should already be set on the local connectivity.
 
         Computes the sparse matrix for this local connectivity.
+
+        The geodesic distance matrix only depends on the mesh and the cutoff.
+        With ``use_cache`` it is saved to, and reused from, the gdist_cache
+        folder of the TVB storage; the folder is kept under
+        ``GDIST_CACHE_MAX_BYTES`` by removing the oldest matrices, and an
+        unreadable cached file is removed and recomputed.
+        ``use_gpu`` is passed on to :meth:`compute`.
         """
         if self.surface is None:
             raise AttributeError('Require surface to compute local connectivity.')
 
-        self.matrix_gdist = surfaces.gdist.local_gdist_matrix(
-            self.surface.vertices.astype(numpy.float64),
-            self.surface.triangles.astype(numpy.int32),
-            max_distance=self.cutoff)
+        vertices = self.surface.vertices.astype(numpy.float64)
+        triangles = self.surface.triangles.astype(numpy.int32)
+        cache_path = self._gdist_cache_path(vertices, triangles) if use_cache else None
+
+        self.matrix_gdist = None
+        if cache_path is not None and os.path.exists(cache_path):
+            self.matrix_gdist = self._load_gdist_cache(cache_path)
+        if self.matrix_gdist is None:
+            # compute() works row by row, convert once here so the cached copy is CSR already
+            self.matrix_gdist = surfaces.gdist.local_gdist_matrix(vertices, triangles,
+                                                                  max_distance=self.cutoff).tocsr()
+            if cache_path is not None:
+                self._store_gdist_cache(cache_path)
 
-        self.compute()
+        self.compute(use_gpu=use_gpu)
         # Avoid having a large data-set in memory.
         self.matrix_gdist = None
+
+    def _gdist_cache_path(self, vertices, triangles):
+        """
+        Path of the cached geodesic distance matrix for this mesh and cutoff.
+        """
+        digest = hashlib.sha1()
+        digest.update(numpy.ascontiguousarray(vertices).data)
+        digest.update(numpy.ascontiguousarray(triangles).data)
+        digest.update(repr(float(self.cutoff)).encode('ascii'))
+        return os.path.join(TvbProfile.current.TVB_STORAGE, "gdist_cache", "gdist_%s.npz" % digest.hexdigest())
+
+    @staticmethod
+    def _load_gdist_cache(cache_path):
+        """
+        Read a cached geodesic distance matrix, removing the file and returning None if it is unreadable.
+        """
+        LOG.info("Loading cached geodesic distance matrix from %s" % cache_path)
+        try:
+            return scipy.sparse.load_npz(cache_path)
+        except Exception as exc:
+            LOG.warning("Discarding unreadable geodesic distance cache %s: %s" % (cache_path, exc))
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            return None
+
+    def _store_gdist_cache(self, cache_path):
+        """
+        Save the geodesic distance matrix; failing to do so only costs a recomputation later.
+
+        The matrix is written to a temporary file in the cache folder and renamed into place,
+        so an interrupted or concurrent run never leaves a partial file at ``cache_path``.
+        """
+        cache_dir = os.path.dirname(cache_path)
+        try:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            handle, temp_path = tempfile.mkstemp(suffix='.npz.tmp', dir=cache_dir)
+            try:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    scipy.sparse.save_npz(temp_file, self.matrix_gdist)
+                os.rename(temp_path, cache_path)
+            except Exception:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError) as exc:
+            LOG.warning("Could not cache geodesic distance matrix in %s: %s" % (cache_path, exc))
+            return
+        self._trim_gdist_cache(cache_dir, keep=cache_path)
+
+    @staticmethod
+    def _trim_gdist_cache(cache_dir, keep):
+        """
+        Remove the least recently written cached matrices, other than ``keep``,
+        until the folder holds at most ``GDIST_CACHE_MAX_BYTES``.
+        """
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith('.npz') and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= GDIST_CACHE_MAX_BYTES:
+                break
+            if path != keep:
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
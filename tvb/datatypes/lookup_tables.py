@@ -37,8 +37,13 @@ methods that are associated with the precalculated look up tables.
 
 """
 
+import os
+import math
+import atexit
+import zipfile
 import numpy
-from tvb.basic.readers import try_get_absolute_path
+from numba import njit, prange
+from tvb.basic.readers import try_get_absolute_path, copy_zip_entry_into_temp
 from tvb.datatypes import arrays
 from tvb.basic.traits import types_basic as basic, types_mapped
 from tvb.basic.logger.builder import get_logger
@@ -46,6 +51,92 @@ from tvb.basic.logger.builder import get_logger
 
 LOG = get_logger(__name__)
 
+# Memory mapped arrays of the .npz tables loaded so far, by archive path
+_MAPPED_TABLES = {}
+
+
+def _load_npz_memory_mapped(npz_path):
+    """
+    Load the arrays of an ``.npz`` archive as read-only memory maps. numpy can
+    only map plain ``.npy`` files, so members are extracted to the temporary
+    folder, once per archive and process.
+    """
+    if npz_path not in _MAPPED_TABLES:
+        archive = zipfile.ZipFile(npz_path)
+        mapped = {}
+        for member in archive.namelist():
+            if not member.endswith(".npy"):
+                continue
+            temp_path = copy_zip_entry_into_temp(archive.open(member), "_" + member)
+            mapped[member[:-4]] = numpy.load(temp_path, mmap_mode='r')
+            try:
+                # The mapping keeps the data reachable on POSIX
+                os.remove(temp_path)
+            except OSError:
+                atexit.register(os.remove, temp_path)
+        archive.close()
+        _MAPPED_TABLES[npz_path] = mapped
+    return _MAPPED_TABLES[npz_path]
+
+
+@njit
+def lut_search_value(val, xmin, invdx, dx, data, df):
+    """
+    Scalar counterpart of :meth:`LookUpTable.search_value` for use inside
+    numba compiled code, e.g. a model's dfun kernel. The table arguments are
+    those returned by :meth:`LookUpTable.njit_args`.
+    """
+    y = val - xmin
+    ind = int(math.floor(y * invdx))
+    if ind < 0 or ind >= data.shape[0]:
+        return numpy.nan
+    return data[ind] + df[ind] * (y - ind * dx)
+
+
+_SPECIALISED_SEARCH_TEMPLATE = """
+def search(val, data, df):
+    y = val - %r
+    ind = int(floor(y * %r))
+    if ind < 0 or ind >= data.shape[0]:
+        return nan
+    return data[ind] + df[ind] * (y - ind * %r)
+"""
+
+
+_SPECIALISED_SEARCHES = {}
+
+
+def specialise_search(xmin, invdx, dx):
+    """
+    Generate a numba kernel ``search(val, data, df)`` equivalent to
+    :func:`lut_search_value`, with the table's ``xmin``, ``invdx`` and ``dx``
+    baked in as literals so they can be constant folded. Kernels are kept
+    per ``(xmin, invdx, dx)``, so tables with the same bounds share one.
+    """
+    key = float(xmin), float(invdx), float(dx)
+    if key not in _SPECIALISED_SEARCHES:
+        ns = {'floor': math.floor, 'nan': numpy.nan}
+        exec(_SPECIALISED_SEARCH_TEMPLATE % key, ns)
+        _SPECIALISED_SEARCHES[key] = njit(ns['search'])
+    return _SPECIALISED_SEARCHES[key]
+
+
+@njit(parallel=True)
+def _lut_gather(val, xmin, invdx, dx, data, df, out):
+    """
+    Interpolate every element of the 1D array ``val`` into ``out``, in parallel.
+    """
+    for i in prange(val.shape[0]):
+        out[i] = lut_search_value(val[i], xmin, invdx, dx, data, df)
+    return out
+
+
+def _check_out(out, shape):
+    "Check a caller supplied output array for :meth:`LookUpTable.search_values`."
+    if out.shape != shape or out.dtype != numpy.float64 or not out.flags.c_contiguous:
+        raise ValueError('out must be a C contiguous float64 array of shape %s' % (shape, ))
+    return out
+
 
 class LookUpTable(types_mapped.MappedType):
     """
@@ -81,26 +172,51 @@ class LookUpTable(types_mapped.MappedType):
         label="df",
         doc=""".""")
 
-    dx = arrays.FloatArray(
+    dx = basic.Float(
         label="dx",
-        default=numpy.array([]),
+        default=0.0,
         doc="""Tabulation step""")
 
-    invdx = arrays.FloatArray(
+    invdx = basic.Float(
         label="invdx",
-        default=numpy.array([]),
-        doc=""".""")
+        default=0.0,
+        doc="""Inverse of the tabulation step""")
 
     @staticmethod
-    def populate_table(result, source_file):
+    def populate_table(result, source_file, dtype=numpy.float64, tolerance=1e-3):
+        """
+        Fill ``result`` from a table file. With a lower precision ``dtype``,
+        e.g. float32 or float16, ``data`` and ``df`` are stored quantized to
+        reduce the memory traffic of lookups; should that change any value by
+        more than ``tolerance``, relative to the largest one, the table stays
+        in double precision. Numba cannot index float16 arrays, so such tables
+        are only searched through numpy.
+        """
         source_full_path = try_get_absolute_path("tvb_data.tables", source_file)
-        zip_data = numpy.load(source_full_path)
+        zip_data = _load_npz_memory_mapped(source_full_path)
 
-        result.df = zip_data['df']
+        result.df = LookUpTable._quantize(zip_data['df'], dtype, tolerance)
         result.xmin, result.xmax = zip_data['min_max']
-        result.data = zip_data['f']
+        result.data = LookUpTable._quantize(zip_data['f'], dtype, tolerance)
         return result
 
+    @staticmethod
+    def _quantize(values, dtype, tolerance):
+        """
+        Convert ``values`` to ``dtype`` if the largest resulting change stays
+        within ``tolerance`` relative to the largest magnitude.
+        """
+        if numpy.dtype(dtype) == values.dtype:
+            return values
+        quantized = values.astype(dtype)
+        scale = numpy.abs(values).max()
+        error = numpy.abs(quantized - values).max() / scale if scale > 0.0 else 0.0
+        if not error <= tolerance:
+            LOG.warning("Keeping look up table in %s, %s would cause a relative error of %g."
+                        % (values.dtype, numpy.dtype(dtype), error))
+            return values
+        return quantized
+
     def configure(self):
         """
         Invoke the compute methods for computable attributes that haven't been
@@ -112,9 +228,13 @@ class LookUpTable(types_mapped.MappedType):
         if self.number_of_values == 0:
             self.number_of_values = self.data.shape[0]
 
-        if self.dx.size == 0:
+        if self.dx == 0.0:
             self.compute_search_indices()
 
+        # Once configured the table bounds are fixed, kernels may call
+        # self.search_kernel(val, self.data, self.df)
+        self.search_kernel = specialise_search(self.xmin, self.invdx, self.dx)
+
     def _find_summary_info(self):
         """
         Gather scientifically interesting summary information from an instance
@@ -127,27 +247,53 @@ class LookUpTable(types_mapped.MappedType):
         """
         ...
         """
-        self.dx = ((self.xmax - self.xmin) / (self.number_of_values) - 1)
-        self.invdx = 1 / self.dx
+        self.dx = float(self.xmax - self.xmin) / (self.number_of_values - 1)
+        self.invdx = 1.0 / self.dx
 
     def search_value(self, val):
         """
-        Search a value in this look up table
+        Search a value, or an array of values, in this look up table by
+        linear interpolation. Values falling outside the table give NaN.
         """
-
-        if self.xmin:
-            y = val - self.xmin
+        dx, invdx = self.dx, self.invdx
+        y = numpy.asarray(val, dtype=numpy.float64) - self.xmin
+        ind = numpy.floor(y * invdx).astype(numpy.intp)
+        # NOTE: not sure if we should return a NaN or make val = self.max
+        # At the moment, we force the input values to be within a known range
+        out_of_bounds = (ind < 0) | (ind >= self.data.shape[0])
+        ind = numpy.where(out_of_bounds, 0, ind)
+        result = self.data[ind] + self.df[ind] * (y - ind * dx)
+        return numpy.where(out_of_bounds, numpy.nan, result)[()]
+
+    def search_values(self, val, out=None):
+        """
+        Search a batch of values in this look up table, e.g. the presynaptic
+        rates of all nodes, in a single parallel pass. ``val`` is flattened
+        and the result, written into ``out`` (a contiguous array) when given,
+        has its shape. A ValueError is raised if ``out`` is not a C contiguous
+        float64 array of that shape.
+        """
+        if self.data.dtype == numpy.float16 or self.df.dtype == numpy.float16:
+            result = self.search_value(val)
+            if out is None:
+                return result
+            _check_out(out, numpy.shape(result))[...] = result
+            return out
+        val = numpy.ascontiguousarray(val, dtype=numpy.float64)
+        if out is None:
+            out = numpy.empty_like(val)
         else:
-            y = val
-
-        ind = numpy.array(y * self.invdx, dtype=int)
+            _check_out(out, val.shape)
+        xmin, invdx, dx, data, df = self.njit_args()
+        _lut_gather(val.reshape(-1), xmin, invdx, dx, data, df, out.reshape(-1))
+        return out
 
-        try:
-            return self.data[ind] + self.df[ind] * (y - ind * self.dx)
-        except IndexError:  # out of bounds
-            return numpy.NaN
-            # NOTE: not sure if we should return a NaN or make val = self.max
-            # At the moment, we force the input values to be within a known range
+    def njit_args(self):
+        """
+        Return ``(xmin, invdx, dx, data, df)`` as plain floats and arrays, to
+        be passed along with a value to :func:`lut_search_value`.
+        """
+        return float(self.xmin), self.invdx, self.dx, self.data, self.df
 
 
 class PsiTable(LookUpTable):
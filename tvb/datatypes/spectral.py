@@ -37,7 +37,9 @@ methods that are associated with the Spectral datatypes.
 
 """
 
+import math
 import numpy
+from numba import njit, prange
 from tvb.basic.logger.builder import get_logger
 from tvb.basic.traits import util, core, types_basic as basic
 from tvb.datatypes import arrays, time_series
@@ -46,6 +48,63 @@ from tvb.datatypes import arrays, time_series
 LOG = get_logger(__name__)
 
 
+def _power_of(array_data):
+    """
+    Squared magnitude of the complex `array_data`, without the square root
+    and temporaries of abs(z) ** 2. It is always computed from the current
+    data, since a stored power may belong to an earlier `array_data`.
+    """
+    re, im = array_data.real, array_data.imag
+    return re * re + im * im
+
+
+def _frequency_grid(freq_step, max_freq):
+    """
+    Multiples of `freq_step` up to `max_freq`, i.e. the bins kept from the
+    FFT of a real segment. The ratio is rounded to 6 decimals before
+    truncating, so floating point error cannot add or drop a bin.
+    """
+    nfreq = int(round(max_freq / freq_step, 6))
+    return numpy.arange(1, nfreq + 1) * freq_step
+
+
+@njit(parallel=True, fastmath=True)
+def _fused_spectra(z, amplitude, phase, power, average_power):
+    """
+    Amplitude, phase, power and the mean power over the last axis of a 2D
+    complex array, written into the given outputs in a single sweep.
+    """
+    n = z.shape[1]
+    for i in prange(z.shape[0]):
+        acc = 0.0
+        for k in range(n):
+            re = z[i, k].real
+            im = z[i, k].imag
+            p = re * re + im * im
+            power[i, k] = p
+            amplitude[i, k] = math.hypot(re, im)
+            phase[i, k] = math.atan2(im, re)
+            acc += p
+        average_power[i] = acc / n
+
+
+def _spectra_of(array_data):
+    """
+    Run `_fused_spectra` over `array_data` viewed as rows of its last axis,
+    returning amplitude, phase, power and average power in its shape.
+    """
+    shape = array_data.shape
+    z = numpy.ascontiguousarray(array_data, dtype=numpy.result_type(array_data, numpy.complex64))
+    z = z.reshape((-1, shape[-1]))
+    amplitude = numpy.empty(z.shape, dtype=z.real.dtype)
+    phase = numpy.empty_like(amplitude)
+    power = numpy.empty_like(amplitude)
+    average_power = numpy.empty(z.shape[0], dtype=z.real.dtype)
+    _fused_spectra(z, amplitude, phase, power, average_power)
+    return (amplitude.reshape(shape), phase.reshape(shape), power.reshape(shape),
+            average_power.reshape(shape[:-1]))
+
+
 class FourierSpectrum(arrays.MappedArray):
     """
     Result of a Fourier  Analysis.
@@ -98,21 +157,13 @@ class FourierSpectrum(arrays.MappedArray):
     def configure(self):
         """After populating few fields, compute the rest of the fields"""
         # Do not call super, because that accesses data not-chunked
-        self.nr_dimensions = len(self.read_data_shape())
-        for i in range(self.nr_dimensions):
-            setattr(self, 'length_%dd' % (i + 1), int(self.read_data_shape()[i]))
-
-        if self.trait.use_storage is False and sum(self.get_data_shape('array_data')) != 0:
-            if self.amplitude.size == 0:
-                self.compute_amplitude()
-            if self.phase.size == 0:
-                self.compute_phase()
-            if self.power.size == 0:
-                self.compute_power()
-            if self.average_power.size == 0:
-                self.compute_average_power()
-            if self.normalised_average_power.size == 0:
-                self.compute_normalised_average_power()
+        self._set_length_attrs(self.read_data_shape())
+
+        # storage backed spectra compute their fields chunk by chunk on write
+        if self.trait.use_storage is True:
+            return
+        if any(self.get_data_shape('array_data')):
+            self._compute_all()
 
     def write_data_slice(self, partial_result):
         """
@@ -122,20 +173,14 @@ class FourierSpectrum(arrays.MappedArray):
 
         self.store_data_chunk('array_data', partial_result.array_data, grow_dimension=2, close_file=False)
 
-        partial_result.compute_amplitude()
-        self.store_data_chunk('amplitude', partial_result.amplitude, grow_dimension=2, close_file=False)
-
-        partial_result.compute_phase()
-        self.store_data_chunk('phase', partial_result.phase, grow_dimension=2, close_file=False)
-
-        partial_result.compute_power()
-        self.store_data_chunk('power', partial_result.power, grow_dimension=2, close_file=False)
-
-        partial_result.compute_average_power()
-        self.store_data_chunk('average_power', partial_result.average_power, grow_dimension=2, close_file=False)
+        amplitude, phase, power, average_power = _spectra_of(partial_result.array_data)
+        normalised_average_power = average_power * (1.0 / average_power.sum(axis=0))
 
-        partial_result.compute_normalised_average_power()
-        self.store_data_chunk('normalised_average_power', partial_result.normalised_average_power,
+        self.store_data_chunk('amplitude', amplitude, grow_dimension=2, close_file=False)
+        self.store_data_chunk('phase', phase, grow_dimension=2, close_file=False)
+        self.store_data_chunk('power', power, grow_dimension=2, close_file=False)
+        self.store_data_chunk('average_power', average_power, grow_dimension=2, close_file=False)
+        self.store_data_chunk('normalised_average_power', normalised_average_power,
                               grow_dimension=2, close_file=False)
 
     def _find_summary_info(self):
@@ -172,12 +217,32 @@ class FourierSpectrum(arrays.MappedArray):
     def frequency(self):
         """ Frequencies represented the complex Fourier spectrum."""
         if self._frequency is None:
-            self._frequency = numpy.arange(self.freq_step,
-                                           self.max_freq + self.freq_step,
-                                           self.freq_step)
+            self._frequency = _frequency_grid(self.freq_step, self.max_freq)
             util.log_debug_array(LOG, self._frequency, "frequency")
         return self._frequency
 
+    def _compute_all(self):
+        """
+        Fill in the empty amplitude, phase, power, average-power and
+        normalised-average-power fields with a single pass over the complex
+        spectrum, sharing the power between all of them.
+        """
+        amplitude, phase, power, average_power = _spectra_of(self.array_data)
+        if self.amplitude.size == 0:
+            self.amplitude = amplitude
+            self.trait["amplitude"].log_debug(owner=self.__class__.__name__)
+        if self.phase.size == 0:
+            self.phase = phase
+            self.trait["phase"].log_debug(owner=self.__class__.__name__)
+        if self.power.size == 0:
+            self.power = power
+            self.trait["power"].log_debug(owner=self.__class__.__name__)
+        if self.average_power.size == 0:
+            self.average_power = average_power
+            self.trait["average_power"].log_debug(owner=self.__class__.__name__)
+        if self.normalised_average_power.size == 0:
+            self.compute_normalised_average_power()
+
     def compute_amplitude(self):
         """ Amplitude of the complex Fourier spectrum."""
         self.amplitude = numpy.abs(self.array_data)
@@ -190,18 +255,19 @@ class FourierSpectrum(arrays.MappedArray):
 
     def compute_power(self):
         """ Power of the complex Fourier spectrum."""
-        self.power = numpy.abs(self.array_data) ** 2
+        self.power = _power_of(self.array_data)
         self.trait["power"].log_debug(owner=self.__class__.__name__)
 
     def compute_average_power(self):
         """ Average-power of the complex Fourier spectrum."""
-        self.average_power = numpy.mean(numpy.abs(self.array_data) ** 2, axis=-1)
+        self.average_power = _power_of(self.array_data).mean(axis=-1)
         self.trait["average_power"].log_debug(owner=self.__class__.__name__)
 
     def compute_normalised_average_power(self):
         """ Normalised-average-power of the complex Fourier spectrum."""
-        self.normalised_average_power = (self.average_power /
-                                         numpy.sum(self.average_power, axis=0))
+        # One reciprocal per frequency sum, then a broadcast multiply.
+        inverse_total = 1.0 / self.average_power.sum(axis=0)
+        self.normalised_average_power = self.average_power * inverse_total
         self.trait["normalised_average_power"].log_debug(owner=self.__class__.__name__)
 
 
@@ -254,17 +320,13 @@ class WaveletCoefficients(arrays.MappedArray):
     def configure(self):
         """After populating few fields, compute the rest of the fields"""
         # Do not call super, because that accesses data not-chunked
-        self.nr_dimensions = len(self.read_data_shape())
-        for i in range(self.nr_dimensions):
-            setattr(self, 'length_%dd' % (i + 1), int(self.read_data_shape()[i]))
-
-        if self.trait.use_storage is False and sum(self.get_data_shape('array_data')) != 0:
-            if self.amplitude.size == 0:
-                self.compute_amplitude()
-            if self.phase.size == 0:
-                self.compute_phase()
-            if self.power.size == 0:
-                self.compute_power()
+        self._set_length_attrs(self.read_data_shape())
+
+        # storage backed spectra compute their fields chunk by chunk on write
+        if self.trait.use_storage is True:
+            return
+        if any(self.get_data_shape('array_data')):
+            self._compute_all()
 
     def _find_summary_info(self):
         """
@@ -291,6 +353,19 @@ class WaveletCoefficients(arrays.MappedArray):
             util.log_debug_array(LOG, self._frequency, "frequency")
         return self._frequency
 
+    def _compute_all(self):
+        """
+        Fill in the empty amplitude, phase and power fields with a single pass
+        over the complex coefficients.
+        """
+        amplitude, phase, power, _ = _spectra_of(self.array_data)
+        if self.amplitude.size == 0:
+            self.amplitude = amplitude
+        if self.phase.size == 0:
+            self.phase = phase
+        if self.power.size == 0:
+            self.power = power
+
     def compute_amplitude(self):
         """ Amplitude of the complex Wavelet coefficients."""
         self.amplitude = numpy.abs(self.array_data)
@@ -301,7 +376,7 @@ class WaveletCoefficients(arrays.MappedArray):
 
     def compute_power(self):
         """ Power of the complex Wavelet coefficients."""
-        self.power = numpy.abs(self.array_data) ** 2
+        self.power = _power_of(self.array_data)
 
     def write_data_slice(self, partial_result):
         """
@@ -309,14 +384,11 @@ class WaveletCoefficients(arrays.MappedArray):
         """
         self.store_data_chunk('array_data', partial_result.array_data, grow_dimension=2, close_file=False)
 
-        partial_result.compute_amplitude()
-        self.store_data_chunk('amplitude', partial_result.amplitude, grow_dimension=2, close_file=False)
-
-        partial_result.compute_phase()
-        self.store_data_chunk('phase', partial_result.phase, grow_dimension=2, close_file=False)
+        amplitude, phase, power, _ = _spectra_of(partial_result.array_data)
 
-        partial_result.compute_power()
-        self.store_data_chunk('power', partial_result.power, grow_dimension=2, close_file=False)
+        self.store_data_chunk('amplitude', amplitude, grow_dimension=2, close_file=False)
+        self.store_data_chunk('phase', phase, grow_dimension=2, close_file=False)
+        self.store_data_chunk('power', power, grow_dimension=2, close_file=False)
 
 
 class CoherenceSpectrum(arrays.MappedArray):
@@ -459,8 +531,6 @@ class ComplexCoherenceSpectrum(arrays.MappedArray):
     def frequency(self):
         """ Frequencies represented in the Complex Coherence Spectrum."""
         if self._frequency is None:
-            self._frequency = numpy.arange(self.freq_step,
-                                           self.max_freq + self.freq_step,
-                                           self.freq_step)
-        util.log_debug_array(LOG, self._frequency, "frequency")
+            self._frequency = _frequency_grid(self.freq_step, self.max_freq)
+            util.log_debug_array(LOG, self._frequency, "frequency")
         return self._frequency
@@ -9,16 +9,41 @@ import pyopencl
 import pyopencl.array
 import numpy
 from ..models import ReducedWongWang
-DEBUG = True
+from ..common import get_logger
+
+LOG = get_logger(__name__)
+
+
 class CLComponent(object):
 
+    # extra options for the OpenCL compiler, e.g. relaxed math for kernels
+    # tolerating approximate transcendental functions
+    _opencl_build_options = ''
+
+    # built programs shared across instances, by (context, source, options)
+    _program_cache = {}
+
+    def _build_program(self, source, options=''):
+        key = self._context, source, options
+        if key not in CLComponent._program_cache:
+            program = pyopencl.Program(self._context, source)
+            CLComponent._program_cache[key] = program.build(options=options)
+        return CLComponent._program_cache[key]
+
     def configure_opencl(self, context, queue):
         self._context = context
         self._queue = queue
         if hasattr(self, '_opencl_program_source'):
-            self._program = pyopencl.Program(context, self._opencl_program_source).build()
-        elif hasattr(self, '_opencl_program_source'):
-            self._program = pyopencl.Program(context, (getattr(self,'_opencl_program_source'),'r').read()).build()
+            source = self._opencl_program_source
+        elif hasattr(self, '_opencl_program_source_file'):
+            with open(self._opencl_program_source_file, 'r') as fd:
+                source = fd.read()
+            self._opencl_program_source = source
+        else:
+            return
+        self._program = self._build_program(source, self._opencl_build_options)
+
+
 class CLModel(CLComponent):
 
     def _alloc_opencl(self, n_nodes ,n_states=1,n_mode=1):
@@ -38,11 +63,18 @@ class CLModel(CLComponent):
         for name, shape in arrays.items():
             self._arrays[name] = pyopencl.array.Array(self._queue, shape, 'f')
 
+        # pinned host staging for the per step inputs, so uploads can be async,
+        # and for the derivatives read back
+        self._host = {}
+        for name in ('state', 'coupling', 'deriv'):
+            self._host[name] = self._alloc_pinned(arrays[name])
+
+        LOG.debug("%s: OpenCL workspace %r", type(self).__name__, arrays)
+
         # fill parameter values
         if hasattr(self, '_opencl_ordered_params'):
-            if(DEBUG):print self._opencl_ordered_params
+            LOG.debug("%s: OpenCL parameters %r", type(self).__name__, self._opencl_ordered_params)
             for i, name in enumerate(self._opencl_ordered_params):
-                if(DEBUG):print i,name
                 val = getattr(self, name)
 
                 if val.size == 1:
@@ -50,8 +82,53 @@ class CLModel(CLComponent):
 
                 self._arrays['param'][i] = val
 
+        # kernels reading parameters through a P(k) macro can be built again
+        # with UNIFORM_PARAMS, so node-invariant parameters come from a small
+        # constant buffer, and with VEC4 to handle four nodes per work item
+        self._param_data = self._arrays['param'].data
+        self._global_size = (n_nodes, )
+        options = self._opencl_build_options
+        if getattr(self, '_opencl_uniform_params', False):
+            values = [getattr(self, name) for name in self._opencl_ordered_params]
+            if all(val.size == 1 for val in values):
+                flags = pyopencl.mem_flags.READ_ONLY | pyopencl.mem_flags.COPY_HOST_PTR
+                hostbuf = numpy.array([val.flat[0] for val in values], dtype=numpy.float32)
+                self._param_data = pyopencl.Buffer(self._context, flags, hostbuf=hostbuf)
+                options += ' -D UNIFORM_PARAMS'
+        if getattr(self, '_opencl_vec4', False) and n_states * n_mode == 1 and n_nodes % 4 == 0:
+            self._global_size = (n_nodes // 4, )
+            options += ' -D VEC4'
+        if options != self._opencl_build_options:
+            self._kernel = self._build_program(self._opencl_program_source, options).dfun
+
         # setup kernel arguments
-        self._kernel.set_args(*[self._arrays[key].data for key in 'state coupling param deriv'.split()])
+        self._bound = None
+        self.bind_device_arrays(self._arrays['state'], self._arrays['coupling'])
+
+    def bind_device_arrays(self, state, coupling):
+        """
+        Set the kernel arguments to read from the given device `state` and
+        `coupling` arrays. Callers keeping their arrays on the device should
+        bind them once; dfunKernel then only enqueues the kernel.
+        """
+        bound = self._bound
+        if bound is not None and bound[0] is state and bound[1] is coupling:
+            return
+        self._kernel.set_args(state.data, coupling.data,
+                              self._param_data, self._arrays['deriv'].data)
+        self._bound = state, coupling
+
+    def _alloc_pinned(self, shape):
+        "Allocate a page-locked float32 host array, mapped from an OpenCL buffer."
+        nbytes = int(numpy.prod(shape)) * numpy.dtype('f').itemsize
+        flags = pyopencl.mem_flags.READ_WRITE | pyopencl.mem_flags.ALLOC_HOST_PTR
+        buf = pyopencl.Buffer(self._context, flags, nbytes)
+        ary, _ = pyopencl.enqueue_map_buffer(self._queue, buf,
+                                             pyopencl.map_flags.READ | pyopencl.map_flags.WRITE,
+                                             0, shape, numpy.float32)
+        # keep the buffer alive as long as its mapping
+        self._pinned_buffers = getattr(self, '_pinned_buffers', []) + [buf]
+        return ary
 
     def configure_opencl(self, context, queue):
         super(CLModel, self).configure_opencl(context, queue)
@@ -59,7 +136,6 @@ class CLModel(CLComponent):
 
         self._kernel = self._program.dfun
 
-
     def dfunKernel(self, state_variables, coupling, local_coupling=0.0):
         n_states = state_variables.shape[0]
         n_nodes = state_variables.shape[1]
@@ -71,45 +147,40 @@ class CLModel(CLComponent):
         # copy if passed host arrays
         if isinstance(state_variables, numpy.ndarray):
             # state_variables, coupling will be (1, n, 1)
-            if(DEBUG):
-                print "state_variables are ndarray","states:", state_variables.shape, "coupling:", coupling.shape
+            self.bind_device_arrays(self._arrays['state'], self._arrays['coupling'])
 
             #self._arrays['state'][:] = state_variables.reshape((1, n_states*n_nodes*n_mode)).astype('f')
             #self._arrays['coupling'][:] = coupling.reshape((1, n_nodes)).astype('f')
 
             # self._arrays['state'] = state_variables.flatten()
             #self._arrays['coupling'] = coupling.reshape((1, n_nodes)).astype('f')
-            if (DEBUG):
-                print "state_variable shape:", state_variables.reshape((n_states, n_nodes * n_mode,1)).astype('f').shape
-                print "array state shape", self._arrays['state'][:].shape
-            self._arrays['state'][:] = state_variables.reshape((n_states,  n_nodes , n_mode)).astype('f')
-            self._arrays['coupling'][:] = coupling.reshape((1, n_nodes)).astype('f')
+            state_host, coupling_host = self._host['state'], self._host['coupling']
+            numpy.copyto(state_host, state_variables.reshape(state_host.shape), casting='unsafe')
+            numpy.copyto(coupling_host, coupling.reshape(coupling_host.shape), casting='unsafe')
+            # in-order queue: the kernel below runs after both uploads complete
+            pyopencl.enqueue_copy(self._queue, self._arrays['state'].data, state_host, is_blocking=False)
+            pyopencl.enqueue_copy(self._queue, self._arrays['coupling'].data, coupling_host, is_blocking=False)
 
 
 
 
-        # set kernel arg if passed device arrays
+        # set kernel arg if passed device arrays not bound yet
         elif isinstance(state_variables, pyopencl.array.Array):
-            self._kernel.set_args(state_variables.data,
-                                  coupling.data,
-                                  self._arrays['param'].data,
-                                  self._arrays['deriv'].data)
+            self.bind_device_arrays(state_variables, coupling)
 
         # otherwise, complain
         else:
             raise TypeError('unsupported data type %r', type(state_variables))
 
-        # run the kernel and wait
-        print "Run kernel..."
-
-        pyopencl.enqueue_nd_range_kernel(self._queue, self._kernel, (n_nodes,), None).wait()
+        # run the kernel; reading deriv back on the same queue waits for it
+        pyopencl.enqueue_nd_range_kernel(self._queue, self._kernel, self._global_size, None)
 
         # return derivatives following input type
         deriv = self._arrays['deriv']
-        if(DEBUG):
-            print "derive shape:",deriv.shape
         if isinstance(state_variables, numpy.ndarray):
-            deriv = deriv.get().reshape((n_states, n_nodes, n_mode)).astype('d')
+            pyopencl.enqueue_copy(self._queue, self._host['deriv'], deriv.data)
+            # a fresh array: integrators such as Heun keep earlier derivatives
+            deriv = self._host['deriv'].astype('d')
 
         return deriv
 
@@ -117,24 +188,41 @@ class CLRWW(ReducedWongWang, CLModel):
 
     _opencl_ordered_params = 'a b d gamma tau_s w J_N I_o'.split()
 
+    _opencl_uniform_params = True
+
+    _opencl_vec4 = True
+
+    _opencl_build_options = '-cl-fast-relaxed-math -cl-mad-enable'
+
     _opencl_program_source = """
-    __kernel void dfun(__global float *state, __global float *coupling,
-                       __global float *param, __global float *deriv)
+    #ifdef VEC4
+    typedef float4 real;
+    #else
+    typedef float real;
+    #endif
+
+    #ifdef UNIFORM_PARAMS
+    #define PARAM_SPACE __constant float
+    #define P(k) param[k]
+    #else
+    #define PARAM_SPACE __global real
+    #define P(k) param[(k)*n+i]
+    #endif
+
+    __kernel void dfun(__global real *state, __global real *coupling,
+                       PARAM_SPACE *param, __global real *deriv)
     {
         int i = get_global_id(0), n = get_global_size(0);
 
         // this is boilerplate and could be generated
-        float S=state[i], a=param[i], b=param[n+i], d=param[2*n+i], g=param[3*n+i],
-              ts=param[4*n+i], w=param[5*n+i], j=param[6*n+i], io=param[7*n+i];
-
-        float x = w*j*S + io + j*coupling[i];
-        float h = (a*x - b) / (1.0f - exp(-d*(a*x - b)));
-        float dx = - (S / ts) + (1.0f - S) * h * g;
+        real S=state[i], a=P(0), b=P(1), d=P(2), g=P(3),
+             ts=P(4), w=P(5), j=P(6), io=P(7);
 
-        bool neg = S < 0.0f;
-        bool gt1 = S > 1.0f;
-        bool i01 = (!neg) && (!gt1);
+        real x = w*j*S + io + j*coupling[i];
+        real h = (a*x - b) / (1.0f - native_exp(-d*(a*x - b)));
+        real dx = - (S / ts) + (1.0f - S) * h * g;
 
-        deriv[i] = neg*(0.0f - S) + gt1*(1.0f - S) + i01*dx;
+        // pull S back into [0, 1] with two selects
+        deriv[i] = select(select(dx, 1.0f - S, S > 1.0f), 0.0f - S, S < 0.0f);
     }
     """
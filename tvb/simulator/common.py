@@ -71,35 +71,66 @@ def log_debug(debug=False, timestamp=False, prefix=''):
 
 import six
 
+_INT_KIND = frozenset('iu')
+
+
+def _astr_number(val, is_int):
+    return '%d' % (val, ) if is_int else '%g' % (val, )
+
+
+def _astr_ndarray(ary):
+    if ary.size == 1:
+        return _astr_number(ary[0], ary.dtype.kind in _INT_KIND)
+    return 'ndarray(%s, %s)' % (ary.shape, ary.dtype)
+
+
+def _astr_real(val):
+    return _astr_number(val, isinstance(val, six.integer_types) or
+                        (hasattr(val, 'dtype') and val.dtype.kind in _INT_KIND))
+
+
+def _astr_handler(cls):
+    "Resolve the astr formatter of a type, walking the isinstance chain once."
+    if issubclass(cls, numpy.ndarray):
+        return _astr_ndarray
+    elif issubclass(cls, bool):
+        return str
+    elif issubclass(cls, float) or issubclass(cls, six.integer_types):
+        return _astr_real
+    return str
+
+
+# astr formatter per exact type, filled on first use
+_astr_handlers = {}
+
+
 def astr(ary):
     "Make short str repr of numerical value."
-    if isinstance(ary, numpy.ndarray):
-        if ary.size == 1:
-            val = ary[0]
-        else:
-            val = 'ndarray(%s, %s)' % (ary.shape, ary.dtype)
-    elif isinstance(ary, bool):
-        val = str(ary)
-    elif isinstance(ary, float) or isinstance(ary, six.integer_types):
-        val = ary
-    else:
-        val = str(ary)
-
-    if isinstance(val, str):
-        return val
-    else:
-        is_py_int = isinstance(val, six.integer_types)
-        is_np_int = hasattr(val, 'dtype') and numpy.issubdtype(ary.dtype, numpy.integer)
-        if is_py_int or is_np_int:
-            return '%d' % (val, )
-        else:
-            return '%g' % (val, )
+    cls = type(ary)
+    try:
+        handler = _astr_handlers[cls]
+    except KeyError:
+        handler = _astr_handlers[cls] = _astr_handler(cls)
+    return handler(ary)
+
+
+# names strings are literals at the call sites, so their splits are memoized
+_split_names = {}
+
+
+def _names(names):
+    "Split a space separated string of attribute names, once per string."
+    try:
+        return _split_names[names]
+    except KeyError:
+        split = _split_names[names] = tuple(names.split())
+        return split
 
 
 def map_astr(self, names):
     "Helper for generating a sequence of astr representation of attributes on self"
     strs = []
-    for name in names.split():
+    for name in _names(names):
         strs.append(astr(getattr(self, name)))
     return tuple(strs)
 
@@ -107,7 +138,7 @@ def map_astr(self, names):
 def simple_gen_astr(self, names):
     "Helper for generating str for object with only numerical attributes."
     strs = []
-    for name, str in zip(names.split(), map_astr(self, names)):
+    for name, str in zip(_names(names), map_astr(self, names)):
         strs.append('%s=%s' % (name, str))
     clsname = self.__class__.__name__
     return '%s(%s)' % (clsname, ', '.join(strs))
@@ -115,8 +146,19 @@ def simple_gen_astr(self, names):
 
 # workaround lack of ufunc at method for older NumPy versions
 def _add_at(dest, map, src):
-    for i in numpy.unique(map):
-        dest[i] += src[i==map].sum(axis=0)
+    map = numpy.asarray(map)
+    if map.size == 0:
+        return dest
+    n = dest.shape[0]
+    if map.min() < -n or map.max() >= n:
+        raise IndexError("index out of bounds for axis 0 with size %d" % n)
+    # wrap negative indices first, so -1 and n - 1 land in the same run
+    map = numpy.where(map < 0, map + n, map)
+    # sort once, then sum each run of equal indices
+    order = numpy.argsort(map, kind='mergesort')
+    keys = map[order]
+    starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(keys)) + 1))
+    dest[keys[starts]] += numpy.add.reduceat(src[order], starts, axis=0)
     return dest
 
 try:
@@ -172,25 +214,32 @@ def linear_interp1d(start_time, end_time, start_value, end_value, interp_point):
 
 def heaviside(array):
     """
-    heaviside() returns 1 if argument > 0, 0 otherwise.
+    heaviside() returns 1 if argument > 0, 0 otherwise; NaN passes through.
+
+    Scalars and arrays agree at 0, which maps to 0. For arrays the result is
+    a new array of the same dtype, so the array passed in is not modified.
 
-    The copy operation here is necessary to ensure that the
-    array passed in is not modified.
+    NOTE: scalars used to differ from arrays, returning 1.0 for 0 and NaN;
+    they now give the array result, 0.0 for 0 and NaN for NaN.
 
     """
 
-    if type(array) == numpy.float64:
-        return 0.0 if array < 0.0 else 1.0
-    else:
-        ret = array.copy()
-        ret[array < 0.0] = 0.0
-        ret[array > 0.0] = 1.0
-        return ret
+    if numpy.isscalar(array):
+        if array > 0.0:
+            return 1.0
+        return array if array != array else 0.0
+    array = numpy.asarray(array)
+    if array.dtype == numpy.bool_:
+        # already 0 or 1, and sign() has no bool loop
+        return array.copy()
+    # sign() then maximum() keeps NaN, without a temporary bool array; the
+    # explicit out keeps 0-d input as an array
+    ret = numpy.sign(array, out=numpy.empty_like(array))
+    return numpy.maximum(ret, 0, out=ret)
 
-# FIXME: this may not work yet
 # FIXME: write a numpy array subclass that takes care of this 
 #         using indexing magic. makes our life easier.
-def unravel_history(history, horizon, step, arange=numpy.arange):
+def unravel_history(history, horizon, step, mask=None):
     """
     in our simulator, history is a 3D numpy array where the time 
     dimension is periodic. This means sometimes, the layout is like
@@ -201,12 +250,13 @@ def unravel_history(history, horizon, step, arange=numpy.arange):
 
         [ t(1), t(2), ... , t(horizon-1), t(horizon) ]
 
-    given some step. This function does that. 
+    given some step. This function does that, i.e. the result at ``t`` is
+    ``history[(t + step) % horizon]``, using two contiguous block copies.
+    For a power of two ``horizon``, pass ``mask=horizon - 1`` to wrap
+    ``step`` with a bit mask.
     """
-    allt, allv, allr = map(arange, history.shape)
-    # ISomething like(?):
-    # return numpy.roll(history, step, axis=0) 
-    return history[ (allt + step) % horizon, allv, allr ]
+    k = step & mask if mask is not None else step % horizon
+    return numpy.concatenate((history[k:horizon], history[:k]), axis=0)
 
 
 def iround(x):
@@ -224,9 +274,27 @@ def iround(x):
     >>> int(4.99999999999999999999)
     5
 
+    This is int(round(x)), so halves round away from zero on Python 2.
+    floor(abs(x) + 0.5) is not used: the addition itself rounds, taking
+    0.49999999999999994 up to 1.
+
+    """
+    return int(round(x))
+
+
+def iround_arr(x):
+    """
+    Elementwise ``iround`` of an array, returning int64 values rounded with
+    the same halves away from zero rule (unlike ``numpy.rint``, which rounds
+    halves to even).
+
     """
-    y = round(x) - .5
-    return int(y) + (y > 0)
+    x = numpy.asarray(x)
+    magnitude = numpy.abs(x)
+    whole = numpy.floor(magnitude)
+    # the fraction is exact, unlike magnitude + 0.5
+    whole += magnitude - whole >= 0.5
+    return numpy.copysign(whole, x).astype(numpy.int64)
 
 
 class Buffer(object):
@@ -234,19 +302,50 @@ class Buffer(object):
     Draft of a history object that allows us to track the current
     state and access the history array in different but consistent 
     ways
+
+    It is a ring of ``horizon`` slots, each holding one state of the given
+    ``shape`` (state variables first), and ``step`` is the head: the slot the
+    next ``write`` goes to. The number of slots is ``horizon`` rounded up to
+    a power of two, so slots wrap with a bit mask instead of a modulo; slots
+    not yet written hold NaN.
+
+    ``raw`` is laid out by state variable, ``(n_sv, horizon, n)``, so the
+    history of one state variable is contiguous and ``read_sv`` streams
+    through it without touching the others.
     """
     step = 0
     raw = None
     horizon = None
+    _mask = None
+
+    def __init__(self, horizon, shape):
+        self.horizon = 1 << (int(horizon) - 1).bit_length()
+        self.shape = tuple(shape)
+        self.raw = numpy.empty((self.shape[0], self.horizon, int(numpy.prod(self.shape[1:]))))
+        self.raw.fill(numpy.nan)
+        self._mask = self.horizon - 1
 
-    def __init__(self):
-        raise NotImplementedError
+    def _slot(self, idx):
+        return (idx + self.step) & self._mask
 
     def __getindex__(self, idx):
-        return self.raw[(idx + self.step)% self.horizon, :, :]
+        return self.raw[:, self._slot(idx)].reshape(self.shape)
 
     def __setindex__(self, idx, rawin):
-        self.raw[(idx + self.step)% self.horizon, :, :] = rawin
+        self.raw[:, self._slot(idx)] = numpy.reshape(rawin, (self.shape[0], -1))
+
+    def write(self, state):
+        "Store ``state`` at the head and advance the head by one slot."
+        self.raw[:, self._slot(0)] = numpy.reshape(state, (self.shape[0], -1))
+        self.step = self._slot(1)
+
+    def read(self, delay):
+        "The state written ``delay`` writes ago, 1 being the latest."
+        return self.raw[:, self._slot(-delay)].reshape(self.shape)
+
+    def read_sv(self, sv_idx, delay):
+        "State variable ``sv_idx`` of the state written ``delay`` writes ago."
+        return self.raw[sv_idx, self._slot(-delay)].reshape(self.shape[1:])
 
 
 def zip_directory(path, zip_file):
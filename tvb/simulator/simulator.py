@@ -324,11 +324,9 @@ class Simulator(core.Type):
                 local_coupling = (self.surface.coupling_strength[0] *
                                   self.surface.local_connectivity.matrix)
             elif self.surface.coupling_strength.size == self.surface.number_of_vertices:
-                ind = numpy.arange(self.number_of_nodes, dtype=numpy.intc)
                 vec_cs = numpy.zeros((self.number_of_nodes,))
                 vec_cs[:self.surface.number_of_vertices] = self.surface.coupling_strength
-                sp_cs = scipy.sparse.csc_matrix((vec_cs, (ind, ind)),
-                                                shape=(self.number_of_nodes, self.number_of_nodes))
+                sp_cs = scipy.sparse.diags(vec_cs, offsets=0, format='csr')
                 local_coupling = sp_cs * self.surface.local_connectivity.matrix
         return local_coupling
 
@@ -31,10 +31,25 @@
 """
 .. moduleauthor:: Bogdan Neacsa <bogdan.neacsa@codemart.ro>
 """
+import copy
 import unittest
 from tvb.basic.profile import TvbProfile
 
 
+# Default datatype instances, loaded once per process
+_DEFAULTS = {}
+
+
+def load_default(datatype_class):
+    """
+    A copy of ``datatype_class(load_default=True)``. The default data is read
+    and parsed once per process; every caller gets its own deep copy.
+    """
+    if datatype_class not in _DEFAULTS:
+        _DEFAULTS[datatype_class] = datatype_class(load_default=True)
+    return copy.deepcopy(_DEFAULTS[datatype_class])
+
+
 
 class BaseTestCase(unittest.TestCase):
     """
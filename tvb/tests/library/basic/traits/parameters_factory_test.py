@@ -64,6 +64,22 @@ class ParametersFactoryTest(BaseTestCase):
             self.assertTrue(key in subclasses)
             
             
+    def test_traitedsubclasses_new_class(self):
+        """
+        Subclasses defined after a lookup show up in the next one.
+        """
+        before = get_traited_subclasses(arrays.FloatArray)
+        self.assertFalse('LateFloatArray' in before)
+        before['extra'] = None
+
+        class LateFloatArray(arrays.FloatArray):
+            pass
+
+        after = get_traited_subclasses(arrays.FloatArray)
+        self.assertTrue(after['LateFloatArray'] is LateFloatArray)
+        self.assertFalse('extra' in after)
+            
+            
     def test_get_traited_instance(self):
         """
         Try to create an instance of a class using the traited method.
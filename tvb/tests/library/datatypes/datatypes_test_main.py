@@ -42,6 +42,7 @@ from tvb.tests.library.datatypes import arrays_test
 from tvb.tests.library.datatypes import connectivity_test
 from tvb.tests.library.datatypes import equations_test
 from tvb.tests.library.datatypes import graph_test
+from tvb.tests.library.datatypes import lookup_tables_test
 from tvb.tests.library.datatypes import mapped_test
 from tvb.tests.library.datatypes import mode_decompositions_test
 from tvb.tests.library.datatypes import patterns_test
@@ -63,6 +64,7 @@ def suite():
     test_suite.addTest(connectivity_test.suite())
     test_suite.addTest(equations_test.suite())
     test_suite.addTest(graph_test.suite())
+    test_suite.addTest(lookup_tables_test.suite())
     test_suite.addTest(mapped_test.suite())
     test_suite.addTest(mode_decompositions_test.suite())
     test_suite.addTest(patterns_test.suite())
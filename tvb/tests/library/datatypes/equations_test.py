@@ -36,6 +36,7 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import numpy
 import unittest
 from tvb.datatypes import equations
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -101,12 +102,60 @@ class EquationsTest(BaseTestCase):
     def test_alpha(self):
         dt = equations.Alpha()
         self.assertEqual(dt.parameters, {'onset': 0.5, 'alpha': 13.0, 'beta': 42.0})
+        var = numpy.linspace(-1.0, 2.0, 31)
+        dt.pattern = var
+        t = var - 0.5
+        expected = 13.0 * 42.0 / (42.0 - 13.0) * (numpy.exp(-13.0 * t) - numpy.exp(-42.0 * t))
+        numpy.testing.assert_allclose(dt.pattern, numpy.where(t > 0, expected, 0.0))
 
         
     def test_pulsetrain(self):
         dt = equations.PulseTrain()
         self.assertEqual(dt.parameters, {'onset': 30.0, 'tau': 13.0, 'T': 42.0, 'amp': 1.0})
 
+
+
+    def test_zero_offset_simplified(self):
+        var = numpy.linspace(-5.0, 5.0, 11)
+        for cls in (equations.Gaussian, equations.Sigmoid):
+            dt = cls()
+            self.assertFalse("offset" in dt._equation_simplified())
+            dt.pattern = var
+            zero_offset = dt.pattern.copy()
+            dt.parameters["offset"] = 2.0
+            self.assertEqual(dt._equation_simplified(), dt.equation)
+            dt.pattern = var
+            numpy.testing.assert_allclose(dt.pattern, zero_offset + 2.0)
+
+    def test_batch_series(self):
+        eqs = [equations.Gaussian(), equations.Sinusoid(), equations.Alpha()]
+        var = equations.series_var(0, 10)
+        series = equations.batch_series(eqs, var)
+        self.assertEqual(len(series), len(eqs))
+        for eq, pattern in zip(eqs, series):
+            eq.pattern = var
+            numpy.testing.assert_allclose(pattern, eq.pattern)
+            self.assertEqual(pattern.shape, var.shape)
+
+    def test_series_var(self):
+        dt = equations.Linear()
+        var = equations.series_var(0, 10)
+        self.assertEqual(var.dtype, numpy.float64)
+        self.assertEqual(var[0, -1], 10.0)
+        result, _ = dt.get_series_data(0, 10)
+        self.assertEqual(len(result), var.size)
+        self.assertTrue(isinstance(result[-1][1], float))
+
+    def test_evaluate_in_place(self):
+        for cls in (equations.Gaussian, equations.DoubleGaussian, equations.Gamma, equations.PulseTrain):
+            dt = cls()
+            var = numpy.linspace(0.0, 100.0, 101)
+            dt.pattern = var
+            expected = dt.pattern.copy()
+            result = dt.evaluate(var, out=var)
+            self.assertTrue(result is var)
+            numpy.testing.assert_allclose(var, expected)
+
         
 def suite():
     """
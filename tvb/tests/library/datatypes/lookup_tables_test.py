@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Tests for the look up tables in `tvb.datatypes.lookup_tables`.
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import os
+import shutil
+import tempfile
+import numpy
+import unittest
+from tvb.datatypes import lookup_tables
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class LookUpTablesTest(BaseTestCase):
+    """
+    Tests the interpolation done by `tvb.datatypes.lookup_tables.LookUpTable`.
+    """
+
+    def _build_table(self):
+        x = numpy.linspace(0.0, 10.0, 101)
+        f = numpy.sin(x)
+        table = lookup_tables.LookUpTable(data=f, df=numpy.gradient(f, x), xmin=x[0], xmax=x[-1])
+        table.configure()
+        return table
+
+    def test_search_indices(self):
+        table = self._build_table()
+        self.assertEqual(table.number_of_values, 101)
+        self.assertAlmostEqual(table.dx, 0.1)
+        self.assertAlmostEqual(table.invdx, 10.0)
+
+    def test_search_value_array(self):
+        table = self._build_table()
+        val = numpy.array([0.0, 0.05, 1.23, 3.0, 9.99])
+        result = table.search_value(val)
+        self.assertEqual(result.shape, val.shape)
+        for v, r in zip(val, result):
+            self.assertEqual(table.search_value(v), r)
+        numpy.testing.assert_allclose(result, numpy.sin(val), atol=5e-3)
+
+    def test_search_value_out_of_bounds(self):
+        table = self._build_table()
+        self.assertTrue(numpy.isnan(table.search_value(-0.5)))
+        self.assertTrue(numpy.isnan(table.search_value(11.0)))
+        result = table.search_value(numpy.array([-1.0, 5.0, 20.0]))
+        self.assertTrue(numpy.isnan(result[0]) and numpy.isnan(result[2]))
+        self.assertFalse(numpy.isnan(result[1]))
+
+    def test_lut_search_value(self):
+        table = self._build_table()
+        args = table.njit_args()
+        for v in (-1.0, 0.0, 0.05, 1.23, 9.99, 12.0):
+            expected = table.search_value(v)
+            result = lookup_tables.lut_search_value(v, *args)
+            if numpy.isnan(expected):
+                self.assertTrue(numpy.isnan(result))
+            else:
+                self.assertAlmostEqual(result, expected)
+
+    def test_search_kernel(self):
+        table = self._build_table()
+        for v in (-1.0, 0.0, 0.05, 1.23, 9.99, 12.0):
+            expected = table.search_value(v)
+            result = table.search_kernel(v, table.data, table.df)
+            if numpy.isnan(expected):
+                self.assertTrue(numpy.isnan(result))
+            else:
+                self.assertAlmostEqual(result, expected)
+        self.assertIs(self._build_table().search_kernel, table.search_kernel)
+
+    def test_search_values(self):
+        table = self._build_table()
+        val = numpy.linspace(-1.0, 11.0, 60).reshape((3, 20))
+        result = table.search_values(val)
+        self.assertEqual(result.shape, val.shape)
+        numpy.testing.assert_allclose(result, table.search_value(val))
+        out = numpy.empty_like(val)
+        self.assertIs(table.search_values(val, out=out), out)
+        numpy.testing.assert_allclose(out, result)
+        for bad_out in (numpy.empty((20, 3)).T, numpy.empty((3, 20), dtype=numpy.float32), numpy.empty(60)):
+            self.assertRaises(ValueError, table.search_values, val, bad_out)
+
+    def test_populate_table_memory_mapped(self):
+        x = numpy.linspace(0.0, 10.0, 101)
+        f = numpy.sin(x)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            table_path = os.path.join(temp_dir, "sin.npz")
+            numpy.savez(table_path, f=f, df=numpy.gradient(f, x), min_max=numpy.array([0.0, 10.0]))
+            table = lookup_tables.LookUpTable.populate_table(lookup_tables.LookUpTable(), table_path)
+            table.configure()
+            self.assertTrue(isinstance(table.data, numpy.memmap))
+            self.assertFalse(table.data.flags.writeable)
+            self.assertEqual(table.xmax, 10.0)
+            numpy.testing.assert_allclose(table.search_value(x[:-1]), f[:-1])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_populate_table_quantized(self):
+        x = numpy.linspace(0.0, 10.0, 101)
+        f = numpy.sin(x)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            table_path = os.path.join(temp_dir, "sin_quantized.npz")
+            numpy.savez(table_path, f=f, df=numpy.gradient(f, x), min_max=numpy.array([0.0, 10.0]))
+            for dtype in (numpy.float32, numpy.float16):
+                table = lookup_tables.LookUpTable.populate_table(lookup_tables.LookUpTable(), table_path, dtype)
+                table.configure()
+                self.assertEqual(table.data.dtype, dtype)
+                numpy.testing.assert_allclose(table.search_values(x[:-1]), f[:-1], atol=1e-3)
+            table = lookup_tables.LookUpTable.populate_table(lookup_tables.LookUpTable(), table_path,
+                                                             numpy.float16, tolerance=1e-6)
+            self.assertEqual(table.data.dtype, numpy.float64)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(LookUpTablesTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -66,6 +66,53 @@ class SpectralTest(BaseTestCase):
         self.assertEqual(dt.shape, (0, ))
         self.assertTrue(dt.source is not None)
         self.assertEqual(dt.windowing_function, '')
+        self.assertEqual(dt.frequency.shape, (50,))
+        self.assertAlmostEqual(dt.frequency[0], 0.01)
+        self.assertAlmostEqual(dt.frequency[-1], 0.5)
+
+
+    def test_frequency_grid_matches_fft_bins(self):
+        for n_points in (93, 98, 99, 100):
+            data = numpy.random.random((n_points, 1, 1, 1))
+            ts = time_series.TimeSeries(data=data, sample_period=1.0)
+            dt = spectral.FourierSpectrum(source=ts, segment_length=float(n_points))
+            self.assertEqual(dt.frequency.shape, (n_points // 2,))
+            self.assertTrue(dt.frequency[-1] <= dt.max_freq)
+
+
+    def test_fourierspectrum_derived_fields(self):
+        data = numpy.random.random((10, 10))
+        ts = time_series.TimeSeries(data=data)
+        array_data = numpy.random.randn(8, 1, 3, 1, 2) + 1j * numpy.random.randn(8, 1, 3, 1, 2)
+        dt = spectral.FourierSpectrum(source=ts,
+                                      segment_length=100,
+                                      array_data=array_data,
+                                      use_storage=False)
+        dt.configure()
+        power = numpy.abs(array_data) ** 2
+        average_power = numpy.mean(power, axis=-1)
+        numpy.testing.assert_allclose(dt.amplitude, numpy.abs(array_data))
+        numpy.testing.assert_allclose(dt.phase, numpy.angle(array_data))
+        numpy.testing.assert_allclose(dt.power, power)
+        numpy.testing.assert_allclose(dt.average_power, average_power)
+        numpy.testing.assert_allclose(dt.normalised_average_power,
+                                      average_power / numpy.sum(average_power, axis=0))
+
+
+    def test_fourierspectrum_reassigned_data(self):
+        data = numpy.random.random((10, 10))
+        ts = time_series.TimeSeries(data=data)
+        array_data = numpy.random.randn(8, 1, 3, 1, 2) + 1j * numpy.random.randn(8, 1, 3, 1, 2)
+        dt = spectral.FourierSpectrum(source=ts, segment_length=100, array_data=array_data)
+        dt.compute_power()
+        dt.array_data = 3 * array_data
+        dt.compute_amplitude()
+        dt.compute_average_power()
+        numpy.testing.assert_allclose(dt.amplitude, 3 * numpy.abs(array_data))
+        numpy.testing.assert_allclose(dt.average_power, 9 * numpy.mean(numpy.abs(array_data) ** 2, axis=-1))
+        dt.array_data = 1e200 * array_data
+        dt.compute_amplitude()
+        numpy.testing.assert_allclose(dt.amplitude, 1e200 * numpy.abs(array_data))
         
         
     def test_waveletcoefficients(self):
@@ -92,6 +139,32 @@ class SpectralTest(BaseTestCase):
         self.assertEqual(dt.sample_period, 7.8125)
         self.assertEqual(dt.shape, (10, 10))
         self.assertTrue(dt.source is not None)
+
+
+    def test_fourierspectrum_write_data_slice(self):
+        ts = time_series.TimeSeries(data=numpy.random.random((10, 10)))
+        array_data = numpy.random.randn(8, 1, 3, 1, 2) + 1j * numpy.random.randn(8, 1, 3, 1, 2)
+        partial = spectral.FourierSpectrum(source=ts, segment_length=100, array_data=array_data)
+        dt = spectral.FourierSpectrum(source=ts, segment_length=100)
+        chunks = {}
+        dt.store_data_chunk = lambda name, data, **kwargs: chunks.setdefault(name, data)
+        dt.write_data_slice(partial)
+        average_power = numpy.mean(numpy.abs(array_data) ** 2, axis=-1)
+        numpy.testing.assert_allclose(chunks['amplitude'], numpy.abs(array_data))
+        numpy.testing.assert_allclose(chunks['phase'], numpy.angle(array_data))
+        numpy.testing.assert_allclose(chunks['average_power'], average_power)
+        numpy.testing.assert_allclose(chunks['normalised_average_power'],
+                                      average_power / average_power.sum(axis=0))
+
+
+    def test_fused_spectra_single_precision(self):
+        array_data = (numpy.random.randn(6, 4) + 1j * numpy.random.randn(6, 4)).astype(numpy.complex64)
+        amplitude, phase, power, average_power = spectral._spectra_of(array_data)
+        self.assertEqual(power.dtype, numpy.float32)
+        self.assertEqual(average_power.shape, (6,))
+        numpy.testing.assert_allclose(amplitude, numpy.abs(array_data), rtol=1e-5)
+        numpy.testing.assert_allclose(phase, numpy.angle(array_data), rtol=1e-5, atol=1e-6)
+        numpy.testing.assert_allclose(average_power, numpy.mean(power, axis=-1), rtol=1e-5)
         
         
     def test_coherencespectrum(self):
@@ -130,6 +203,7 @@ class SpectralTest(BaseTestCase):
         self.assertEqual(dt.shape, (10, 10))
         self.assertTrue(dt.source is not None)
         self.assertEqual(dt.windowing_function, '')
+        self.assertAlmostEqual(dt.frequency[0], 0.2)
         
         
 def suite():
@@ -32,6 +32,7 @@
 .. moduleauthor:: Bogdan Neacsa <bogdan.neacsa@codemart.ro>
 """
 from tvb.datatypes.cortex import Cortex
+from tvb.datatypes import local_connectivity
 from tvb.datatypes.local_connectivity import LocalConnectivity
 from tvb.datatypes.region_mapping import RegionMapping
 
@@ -39,10 +40,15 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import os
+import shutil
+import tempfile
 import unittest
 import sys
 import numpy
-from tvb.datatypes import surfaces
+import scipy.sparse
+from tvb.basic.profile import TvbProfile
+from tvb.datatypes import equations, surfaces
 from tvb.tests.library.base_testcase import BaseTestCase
 
 
@@ -210,6 +216,164 @@ class SurfacesTest(BaseTestCase):
         self.assertTrue(dt.surface is None)
 
 
+    def test_localconnectivity_compute(self):
+        dist = scipy.sparse.random(200, 200, density=0.05, format='csc',
+                                   random_state=numpy.random.RandomState(42)) * 10.0
+        dist = (dist + dist.T).tocsc()
+        dt = LocalConnectivity(equation=equations.Gaussian(parameters={"amp": 1.0, "sigma": 3.0,
+                                                                       "midpoint": 0.0, "offset": 0.0}))
+        dt.matrix_gdist = dist.copy()
+        dt.compute()
+        self.assertEqual(dt.matrix.shape, (200, 200))
+        self.assertEqual(dt.matrix.format, 'csc')
+        self.assertTrue(dt.matrix.has_sorted_indices)
+        contrib = numpy.asarray(dt.matrix.sum(axis=1)).ravel()
+        weights = numpy.exp(-dist.toarray() ** 2 / 18.0) * (dist.toarray() != 0)
+        expected_mean = weights.sum(axis=1).mean()
+        numpy.testing.assert_allclose(contrib[contrib != 0], expected_mean)
+
+
+    def test_localconnectivity_compute_prunes_zeros(self):
+        dist = scipy.sparse.random(200, 200, density=0.05, format='csc',
+                                   random_state=numpy.random.RandomState(42)) * 10.0
+        dist = (dist + dist.T).tocsc()
+        # far enough for the Gaussian weights to underflow to exactly 0
+        dist.data[::7] = 1000.0
+        dt = LocalConnectivity(equation=equations.Gaussian(parameters={"amp": 1.0, "sigma": 3.0,
+                                                                       "midpoint": 0.0, "offset": 0.0}))
+        dt.matrix_gdist = dist.copy()
+        dt.compute()
+        self.assertTrue(dt.matrix.has_sorted_indices)
+        self.assertEqual(dt.matrix.nnz, dist.nnz - len(dist.data[::7]))
+        self.assertFalse((dt.matrix.data == 0.0).any())
+
+
+    @unittest.skipIf(local_connectivity.cupy is None, "CuPy is not available.")
+    def test_localconnectivity_compute_gpu(self):
+        dist = scipy.sparse.random(300, 300, density=0.05, format='csc',
+                                   random_state=numpy.random.RandomState(42)) * 10.0
+        dist = (dist + dist.T).tocsc()
+        min_vertices = local_connectivity.GPU_MIN_VERTICES
+        local_connectivity.GPU_MIN_VERTICES = 0
+        try:
+            results = []
+            for use_gpu in (False, True):
+                dt = LocalConnectivity(equation=equations.DoubleGaussian())
+                dt.matrix_gdist = dist.copy()
+                dt.compute(use_gpu=use_gpu)
+                results.append(dt.matrix.toarray())
+            # the GPU row sums are accumulated in no fixed order, see _gpu_homogenise
+            numpy.testing.assert_allclose(results[1], results[0], rtol=1e-12, atol=0)
+        finally:
+            local_connectivity.GPU_MIN_VERTICES = min_vertices
+
+
+    def test_localconnectivity_compute_gpu_fallback(self):
+        class CUDARuntimeError(RuntimeError):
+            pass
+
+        class FakeCupy(object):
+            class cuda(object):
+                class runtime(object):
+                    pass
+            cuda.runtime.CUDARuntimeError = CUDARuntimeError
+
+            @staticmethod
+            def asarray(array):
+                raise CUDARuntimeError("cudaErrorNoDevice: no CUDA-capable device is detected")
+
+        dist = scipy.sparse.random(300, 300, density=0.05, format='csc',
+                                   random_state=numpy.random.RandomState(42)) * 10.0
+        dist = (dist + dist.T).tocsc()
+        cupy, min_vertices = local_connectivity.cupy, local_connectivity.GPU_MIN_VERTICES
+        local_connectivity.cupy, local_connectivity.GPU_MIN_VERTICES = FakeCupy, 0
+        try:
+            results = []
+            for use_gpu in (False, True):
+                dt = LocalConnectivity(equation=equations.DoubleGaussian())
+                dt.matrix_gdist = dist.copy()
+                dt.compute(use_gpu=use_gpu)
+                results.append(dt.matrix.toarray())
+            numpy.testing.assert_array_equal(results[1], results[0])
+        finally:
+            local_connectivity.cupy, local_connectivity.GPU_MIN_VERTICES = cupy, min_vertices
+
+
+    def _gdist_cache_case(self):
+        surface = surfaces.CorticalSurface()
+        surface.vertices = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]]).astype(numpy.float64)
+        surface.triangles = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+        dt = LocalConnectivity(surface=surface, cutoff=5.0)
+        cache_path = dt._gdist_cache_path(surface.vertices, surface.triangles.astype(numpy.int32))
+        return dt, cache_path
+
+
+    def _with_storage(self, test):
+        storage = TvbProfile.current.TVB_STORAGE
+        TvbProfile.current.TVB_STORAGE = tempfile.mkdtemp()
+        try:
+            test()
+        finally:
+            shutil.rmtree(TvbProfile.current.TVB_STORAGE)
+            TvbProfile.current.TVB_STORAGE = storage
+
+
+    def test_localconnectivity_gdist_cache(self):
+        def test():
+            dt, cache_path = self._gdist_cache_case()
+            dt.compute_sparse_matrix()
+            self.assertFalse(os.path.exists(cache_path))
+            expected = dt.matrix.toarray()
+            dt.compute_sparse_matrix(use_cache=True)
+            self.assertTrue(os.path.exists(cache_path))
+            self.assertEqual(os.listdir(os.path.dirname(cache_path)), [os.path.basename(cache_path)])
+            # a cache hit must not compute the geodesic distances again
+            local_gdist_matrix = surfaces.gdist.local_gdist_matrix
+            def fail(*args, **kwargs):
+                raise AssertionError("geodesic distances recomputed despite the cache")
+            surfaces.gdist.local_gdist_matrix = fail
+            try:
+                dt.compute_sparse_matrix(use_cache=True)
+            finally:
+                surfaces.gdist.local_gdist_matrix = local_gdist_matrix
+            numpy.testing.assert_allclose(dt.matrix.toarray(), expected)
+        self._with_storage(test)
+
+
+    def test_localconnectivity_gdist_cache_corrupt(self):
+        def test():
+            dt, cache_path = self._gdist_cache_case()
+            dt.compute_sparse_matrix()
+            expected = dt.matrix.toarray()
+            os.makedirs(os.path.dirname(cache_path))
+            with open(cache_path, 'wb') as cache_file:
+                cache_file.write(b'truncated')
+            dt.compute_sparse_matrix(use_cache=True)
+            numpy.testing.assert_allclose(dt.matrix.toarray(), expected)
+            # the unreadable file was replaced by a good one
+            numpy.testing.assert_allclose(scipy.sparse.load_npz(cache_path).toarray() != 0, expected != 0)
+        self._with_storage(test)
+
+
+    def test_localconnectivity_gdist_cache_trim(self):
+        def test():
+            dt, cache_path = self._gdist_cache_case()
+            stale = os.path.join(os.path.dirname(cache_path), 'gdist_stale.npz')
+            os.makedirs(os.path.dirname(cache_path))
+            with open(stale, 'wb') as stale_file:
+                stale_file.write(b'0' * 1024)
+            os.utime(stale, (0, 0))
+            max_bytes = local_connectivity.GDIST_CACHE_MAX_BYTES
+            local_connectivity.GDIST_CACHE_MAX_BYTES = 1
+            try:
+                dt.compute_sparse_matrix(use_cache=True)
+            finally:
+                local_connectivity.GDIST_CACHE_MAX_BYTES = max_bytes
+            self.assertFalse(os.path.exists(stale))
+            self.assertTrue(os.path.exists(cache_path))
+        self._with_storage(test)
+
+
     @unittest.skipIf(sys.maxsize <= 2147483647, "Cannot deal with local connectivity on a 32-bit machine.")
     def test_cortexdata(self):
 
@@ -56,8 +56,7 @@ class CommonTest(BaseTestCase):
         st = common.Struct(x =42.0, y=33.0)
         self.assertEqual(st.x, 42.0)
         self.assertEqual(st.y, 33.0)
-        
-    
+
     def test_linear_interpolation(self):
         t_start = 0.0
         t_end   = 1.0 
@@ -66,22 +65,62 @@ class CommonTest(BaseTestCase):
         t_mid   = 0.5
         val = common.linear_interp1d(t_start, t_end, y_start, y_end, t_mid)
         self.assertEqual(val, 6.0)
-        
-        
+
+    def test_heaviside(self):
+        array = numpy.array([-2.0, 0.0, 0.5, 3.0])
+        numpy.testing.assert_array_equal(common.heaviside(array), [0.0, 0.0, 1.0, 1.0])
+        numpy.testing.assert_array_equal(array, [-2.0, 0.0, 0.5, 3.0])
+        self.assertEqual(common.heaviside(numpy.float64(-1.0)), 0.0)
+        self.assertEqual(common.heaviside(2.0), 1.0)
+        # scalars give the same result as arrays, 0 at 0 and NaN for NaN
+        values = [-2.0, -0.0, 0.0, 1e-300, 3.0, numpy.nan]
+        numpy.testing.assert_array_equal([common.heaviside(v) for v in values],
+                                         common.heaviside(numpy.array(values)))
+        numpy.testing.assert_array_equal([common.heaviside(numpy.float64(v)) for v in values],
+                                         common.heaviside(numpy.array(values)))
+        result = common.heaviside(numpy.array([numpy.nan, -1.0, 1.0]))
+        self.assertTrue(numpy.isnan(result[0]))
+        numpy.testing.assert_array_equal(result[1:], [0.0, 1.0])
+        self.assertEqual(common.heaviside(numpy.array([-3, 0, 4])).tolist(), [0, 0, 1])
+        result = common.heaviside(numpy.array(-0.5))
+        self.assertIsInstance(result, numpy.ndarray)
+        self.assertEqual(result.shape, ())
+        self.assertEqual(result, 0.0)
+        self.assertEqual(common.heaviside(numpy.array(0.5)), 1.0)
+        result = common.heaviside(numpy.array([True, False]))
+        self.assertEqual(result.dtype, numpy.bool_)
+        self.assertEqual(result.tolist(), [True, False])
+
+    def test_iround(self):
+        values = [4.999999999999999, 2.5, -2.5, 0.4, 0.6, -0.6, 3.0, -7.0,
+                  0.49999999999999994, -0.49999999999999994]
+        expected = [5, 3, -3, 0, 1, -1, 3, -7, 0, 0]
+        self.assertEqual([common.iround(value) for value in values], expected)
+        self.assertEqual([int(round(value)) for value in values], expected)
+        numpy.testing.assert_array_equal(common.iround_arr(values), expected)
+
     def test_unravel_history(self):
-        """
-        This class does not work and it's not used ... maybe should tag it as
-        deprecated
-        """
-        pass
-        
-        
+        horizon = 7
+        history = numpy.random.rand(horizon, 2, 5)
+        for step in (0, 3, 7, 12):
+            expected = history[(numpy.arange(horizon) + step) % horizon]
+            numpy.testing.assert_array_equal(common.unravel_history(history, horizon, step), expected)
+        history = numpy.random.rand(8, 2, 5)
+        for step in (0, 3, 8, 13):
+            expected = history[(numpy.arange(8) + step) % 8]
+            numpy.testing.assert_array_equal(common.unravel_history(history, 8, step, mask=7), expected)
+
     def test_Buffer(self):
-        """
-        It seems to be unused as well ... maybe should tag it as
-        deprecated
-        """
-        pass
+        for horizon in (4, 5):
+            buf = common.Buffer(horizon, (2, 3, 1))
+            self.assertEqual(buf.horizon, 4 if horizon == 4 else 8)
+            self.assertTrue(numpy.isnan(buf.read(1)).all())
+            states = numpy.random.rand(horizon + 2, 2, 3, 1)
+            for state in states:
+                buf.write(state)
+            for delay in range(1, horizon + 1):
+                numpy.testing.assert_array_equal(buf.read(delay), states[-delay])
+                numpy.testing.assert_array_equal(buf.read_sv(1, delay), states[-delay][1])
 
     @unittest.skipIf(not hasattr(numpy.add, 'at'),
                      'Cannot test fallback numpy.add.at implementation without '
@@ -96,6 +135,14 @@ class CommonTest(BaseTestCase):
             numpy.add.at(expected, map, source)
             common._add_at(actual, map, source)
             self.assertTrue(numpy.allclose(expected, actual))
+        map = numpy.array([0, -1, 3, 2, -4, 3])
+        expected, actual = numpy.zeros((2, 4), dtype=numpy.int64)
+        source = numpy.array([2 ** 60, 1, 2, 3, 4, 5])
+        numpy.add.at(expected, map, source)
+        common._add_at(actual, map, source)
+        numpy.testing.assert_array_equal(actual, expected)
+        self.assertRaises(IndexError, common._add_at, actual, numpy.array([0, 4]), source[:2])
+        self.assertRaises(IndexError, common._add_at, actual, numpy.array([0, -5]), source[:2])
 
     def setUp(self):
         pass
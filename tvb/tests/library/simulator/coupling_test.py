@@ -42,7 +42,7 @@ if True or __name__ == "__main__":
 import copy
 import numpy
 import unittest
-from tvb.tests.library.base_testcase import BaseTestCase
+from tvb.tests.library.base_testcase import BaseTestCase, load_default
 from tvb.simulator import coupling, models, simulator
 from tvb.datatypes import cortex, connectivity
 from tvb.simulator.history import SparseHistory
@@ -54,95 +54,45 @@ class CouplingTest(BaseTestCase):
         - check functionality
         
     """
-    weights = numpy.array([[0, 1], [1, 0]])
+    # binary weights and small states fit narrow types
+    weights = numpy.array([[0, 1], [1, 0]], dtype=numpy.uint8)
     weights = weights[:, numpy.newaxis, :, numpy.newaxis]  # nodes, ncvar, nodes, modes
 
     state_1sv = numpy.array([[[1], [2]]])               # (state_variables, nodes, modes)
     state_2sv = numpy.array([[[1], [2]], [[1], [2]]])
-    delayed_state_1sv = numpy.ones((2, 1, 2, 1))        # nodes, state_variables, nodes, modes
-    delayed_state_2sv = numpy.ones((2, 2, 2, 1))
+    delayed_state_1sv = numpy.ones((2, 1, 2, 1), dtype=numpy.float32)  # nodes, state_variables, nodes, modes
+    delayed_state_2sv = numpy.ones((2, 2, 2, 1), dtype=numpy.float32)
 
     weights2d = weights[:, 0, :, 0]
     history_1sv = SparseHistory(weights2d, weights2d*0, numpy.r_[0], 1)
     history_2sv = SparseHistory(weights2d, weights2d*0, numpy.r_[0, 1], 1)
 
 
-    def _apply_coupling(self, k):
-        k.configure()
-        k(0, self.history_1sv)
+    # coupling class, expected defaults and number of coupled state variables
+    defaults = [
+        (coupling.Difference, {'a': 0.1}, 1),
+        (coupling.HyperbolicTangent, {'a': 1, 'b': 1, 'midpoint': 0, 'sigma': 1}, 1),
+        (coupling.Kuramoto, {'a': 1}, 1),
+        (coupling.Linear, {'a': 0.00390625, 'b': 0.0}, 1),
+        (coupling.PreSigmoidal, {'H': 0.5, 'Q': 1., 'G': 60., 'P': 1., 'theta': 0.5,
+                                 'dynamic': True, 'globalT': False}, 2),
+        (coupling.Scaling, {'a': 0.00390625}, 1),
+        (coupling.Sigmoidal, {'cmin': -1.0, 'cmax': 1.0, 'midpoint': 0.0, 'sigma': 230., 'a': 1.0}, 1),
+        (coupling.SigmoidalJansenRit, {'cmin': 0.0, 'cmax': 2.0 * 0.0025, 'midpoint': 6.0,
+                                       'r': 1.0, 'a': 0.56}, 2),
+    ]
 
 
-    def _apply_coupling_2sv(self, k):
-        k.configure()
-        k(0, self.history_2sv)
+    def test_couplings(self):
+        histories = {1: self.history_1sv, 2: self.history_2sv}
+        for coupling_class, defaults, n_cvar in self.defaults:
+            k = coupling_class()
+            for name, value in defaults.items():
+                self.assertEqual(value, getattr(k, name), "%s.%s:" % (coupling_class.__name__, name))
+            k.configure()
+            k(0, histories[n_cvar])
 
 
-    def test_difference_coupling(self):
-        k = coupling.Difference()
-        self.assertEqual(k.a, 0.1)
-        self._apply_coupling(k)
-
-
-    def test_hyperbolic_coupling(self):
-        k = coupling.HyperbolicTangent()
-        self.assertEqual(k.a, 1)
-        self.assertEqual(k.b, 1)
-        self.assertEqual(k.midpoint, 0)
-        self.assertEqual(k.sigma, 1)
-        self._apply_coupling(k)
-
-
-    def test_kuramoto_coupling(self):
-        k = coupling.Kuramoto()
-        self.assertEqual(k.a, 1)
-        self._apply_coupling(k)
-
-
-    def test_linear_coupling(self):
-        k = coupling.Linear()
-        self.assertEqual(k.a, 0.00390625)
-        self.assertEqual(k.b, 0.0)
-        self._apply_coupling(k)
-
-
-    def test_pre_sigmoidal_coupling(self):
-        k = coupling.PreSigmoidal()
-        self.assertEqual(k.H, 0.5)
-        self.assertEqual(k.Q, 1.)
-        self.assertEqual(k.G, 60.)
-        self.assertEqual(k.P, 1.)
-        self.assertEqual(k.theta, 0.5)
-        self.assertEqual(k.dynamic, True)
-        self.assertEqual(k.globalT, False)
-        self._apply_coupling_2sv(k)
-
-
-    def test_scaling_coupling(self):
-        k = coupling.Scaling()
-        # Check scaling -factor
-        self.assertEqual(k.a, 0.00390625)
-        self._apply_coupling(k)
-
-
-    def test_sigmoidal_coupling(self):
-        k = coupling.Sigmoidal()
-        self.assertEqual(k.cmin, -1.0)
-        self.assertEqual(k.cmax, 1.0)
-        self.assertEqual(k.midpoint, 0.0)
-        self.assertEqual(k.sigma, 230.)
-        self.assertEqual(k.a, 1.0)
-        self._apply_coupling(k)
-
-
-    def test_sigmoidal_jr_coupling(self):
-        k = coupling.SigmoidalJansenRit()
-        self.assertEqual(k.cmin, 0.0)
-        self.assertEqual(k.cmax, 2.0 * 0.0025)
-        self.assertEqual(k.midpoint, 6.0)
-        self.assertEqual(k.r, 1.0)
-        self.assertEqual(k.a, 0.56)
-        self._apply_coupling_2sv(k)
-
 
 class CouplingShapeTest(BaseTestCase):
 
@@ -166,10 +116,10 @@ class CouplingShapeTest(BaseTestCase):
                     )
                     return state
 
-        surf = cortex.Cortex(load_default=True)
+        surf = load_default(cortex.Cortex)
         sim = simulator.Simulator(
             model=CouplingShapeTestModel(self, surf.vertices.shape[0]),
-            connectivity=connectivity.Connectivity(load_default=True),
+            connectivity=load_default(connectivity.Connectivity),
             surface=surf)
 
         sim.configure()
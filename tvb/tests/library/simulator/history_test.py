@@ -41,6 +41,7 @@ if __name__ == "__main__":
 
 import numpy
 import unittest
+from numba import njit
 import tvb.basic.traits.types_basic as basic
 from tvb.datatypes.connectivity import Connectivity
 from tvb.simulator.coupling import Coupling
@@ -55,10 +56,24 @@ from tvb.tests.library.base_testcase import BaseTestCase
 class IdCoupling(Coupling):
     """Implements an identity coupling function."""
 
+    _out = None
+
     def __call__(self, step, history):
         g_ij = history.es_weights
         x_i, x_j = history.query(step)
-        return (g_ij * x_j).sum(axis=2).transpose((1, 0, 2))
+        shape = x_j.shape[1], x_j.shape[0], x_j.shape[3]
+        if self._out is None or self._out.shape != shape:
+            self._out = numpy.empty(shape)
+        # a single contraction over the source nodes, into (cvar, node, mode)
+        return numpy.einsum('ij,icjm->cim', g_ij[:, 0, :, 0], x_j, out=self._out)
+
+
+
+@njit(fastmath=True)
+def _sum_step(x, coupling, local_coupling, out):
+    "out = x + coupling + local_coupling in one pass over flat arrays."
+    for i in range(x.shape[0]):
+        out[i] = x[i] + coupling[i] + local_coupling
 
 
 
@@ -71,7 +86,30 @@ class Sum(Model):
     cvar = numpy.array([0])
 
     def dfun(self, X, coupling, local_coupling=0):
-        return X + coupling + local_coupling
+        if not numpy.isscalar(local_coupling) or X.shape != coupling.shape:
+            return X + coupling + local_coupling
+        # a fresh output, as the Identity integrator makes it the next state
+        out = numpy.empty(X.shape)
+        _sum_step(X.reshape(-1), coupling.reshape(-1), float(local_coupling), out.reshape(-1))
+        return out
+
+
+
+@njit
+def _expected_propagation(n, steps):
+    """
+    Reference states of the chain simulation below: node i adds the state of
+    node i + 1 delayed by its tract length i * n + i + 1, all history being
+    ones. Nodes are done last to first, as each one needs the complete past
+    of its successor.
+    """
+    horizon = n * n
+    x = numpy.ones((horizon + steps, n))
+    for i in range(n - 2, -1, -1):
+        delay = i * n + i + 1
+        for t in range(horizon, horizon + steps):
+            x[t, i] = x[t - 1, i] + x[t - 1 - delay, i + 1]
+    return x[horizon:]
 
 
 
@@ -102,11 +140,12 @@ class ExactPropagationTests(BaseTestCase):
     def test_propagation(self):
         n = 4
         self.build_simulator(n=n)
-        # x = numpy.zeros((n, ))
-        xs = []
-        for (t, raw), in self.sim(simulation_length=10):
-            xs.append(raw.flat[:].copy())
-        xs = numpy.array(xs)
+        steps = int(10 / self.sim.integrator.dt)
+        xs = numpy.empty((steps, n))
+        i = -1
+        for i, ((t, raw), ) in enumerate(self.sim(simulation_length=10)):
+            xs[i] = raw.ravel()
+        self.assertEqual(i + 1, steps)
         xs_ = numpy.array([[2., 2., 2., 1.],
                            [3., 3., 3., 1.],
                            [5., 4., 4., 1.],
@@ -118,6 +157,14 @@ class ExactPropagationTests(BaseTestCase):
                            [38., 13., 10., 1.],
                            [48., 17., 11., 1.]])
         self.assertTrue(numpy.allclose(xs, xs_))
+        self.assertTrue(numpy.allclose(_expected_propagation(n, steps), xs_))
+
+
+    def test_propagation_oracle(self):
+        for n in (6, 9):
+            self.build_simulator(n=n)
+            xs = numpy.array([raw.ravel() for (t, raw), in self.sim(simulation_length=10)])
+            self.assertTrue(numpy.allclose(xs, _expected_propagation(n, 10)))
 
 
 
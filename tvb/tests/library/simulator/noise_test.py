@@ -40,6 +40,7 @@ if __name__ == "__main__":
     setup_test_console_env()
     
 import unittest
+import numpy
 
 from tvb.tests.library.base_testcase import BaseTestCase
 from tvb.simulator import noise
@@ -50,16 +51,99 @@ class NoiseTest(BaseTestCase):
         noise_stream = noise.RandomStream()
         self.assertEqual(noise_stream.init_seed, 42)
 
+    @unittest.skipIf(not hasattr(numpy.random, 'Generator'), 'numpy.random.Generator not available')
+    def test_generator_stream(self):
+        shape = (2, 10, 1)
+        noise_white = noise.Additive()
+        noise_white.random_stream = numpy.random.Generator(numpy.random.PCG64(42))
+        noise_white.configure_white(0.1, shape)
+        first = noise_white.generate(shape).copy()
+        noise_white.trait["random_stream"].reset()
+        numpy.testing.assert_allclose(noise_white.generate(shape), first)
 
     def test_additive(self):
         noise_additive = noise.Additive()
         self.assertEqual(noise_additive.ntau,  0.0)
-        
-        
+        g_x = noise_additive.gfun(None)
+        numpy.testing.assert_allclose(g_x, numpy.sqrt(2.0))
+        self.assertTrue(noise_additive.gfun(None) is g_x)
+        noise_additive.nsig = numpy.array([0.5])
+        numpy.testing.assert_allclose(noise_additive.gfun(None), numpy.sqrt(1.0))
+        noise_additive.nsig *= 8.0
+        numpy.testing.assert_allclose(noise_additive.gfun(None), numpy.sqrt(8.0))
+        self.assertFalse(noise_additive.gfun(None).flags.writeable)
+
+    @unittest.skipIf(not hasattr(numpy.random, 'SeedSequence'), 'numpy.random.SeedSequence not available')
+    def test_parallel_white(self):
+        shape = (2, 1000, 1)
+        noise_white = noise.Additive()
+        noise_white.configure_white(0.1, shape, n_threads=4)
+        self.assertEqual(len(noise_white._streams), 4)
+        first = noise_white.generate(shape).copy()
+        second = noise_white.generate(shape)
+        self.assertFalse(numpy.allclose(first, second))
+        self.assertTrue(abs(first.std() - numpy.sqrt(0.1)) < 0.05)
+
     def test_multiplicative(self):
         noise_multiplicative = noise.Multiplicative()
         self.assertEqual(noise_multiplicative.ntau,  0.0)
         self.assertTrue(isinstance(noise_multiplicative.b, equations.Linear))
+        noise_multiplicative.nsig = numpy.array([0.5, 2.0])[:, numpy.newaxis, numpy.newaxis]
+        state = numpy.random.rand(2, 10, 1)
+        g_x = noise_multiplicative.gfun(state)
+        numpy.testing.assert_allclose(g_x, numpy.sqrt(2.0 * noise_multiplicative.nsig) * state)
+        noise_multiplicative.nsig = numpy.array([1.0])
+        numpy.testing.assert_allclose(noise_multiplicative.gfun(state), numpy.sqrt(2.0) * state)
+        noise_multiplicative.nsig[:] = 2.0
+        numpy.testing.assert_allclose(noise_multiplicative.gfun(state), 2.0 * state)
+
+    def test_white(self):
+        shape = (2, 10, 1)
+        noise_white = noise.Additive()
+        noise_white.configure_white(0.1, shape)
+        expected = numpy.sqrt(0.1) * numpy.random.RandomState(42).normal(size=shape)
+        numpy.testing.assert_allclose(noise_white.generate(shape), expected)
+
+    def test_coloured(self):
+        shape = (2, 10, 1)
+        noise_coloured = noise.Additive(ntau=2.0)
+        noise_coloured.configure_coloured(0.1, shape)
+        rng = numpy.random.RandomState(42)
+        eta = rng.normal(size=shape)
+        E = numpy.exp(-0.1 / 2.0)
+        for _ in range(3):
+            eta = eta * E + numpy.sqrt(1.0 - E ** 2) * rng.normal(size=shape)
+            numpy.testing.assert_allclose(noise_coloured.generate(shape), 0.1 * numpy.sqrt(0.5) * eta)
+
+    def test_generate_out(self):
+        shape = (2, 10, 1)
+        for ntau in (0.0, 2.0):
+            reference = noise.Additive(ntau=ntau)
+            noise_out = noise.Additive(ntau=ntau)
+            for item in (reference, noise_out):
+                if ntau > 0.0:
+                    item.configure_coloured(0.1, shape)
+                else:
+                    item.configure_white(0.1, shape)
+            out = numpy.empty(shape)
+            for _ in range(3):
+                self.assertTrue(noise_out.generate(shape, out=out) is out)
+                numpy.testing.assert_allclose(out, reference.generate(shape))
+            self.assertRaises(ValueError, noise_out.generate, shape, out=numpy.empty((2, 10)))
+
+    def test_coloured_single_precision(self):
+        shape = (2, 10, 1)
+        noise_coloured = noise.Additive(ntau=2.0)
+        noise_coloured.configure_coloured(0.1, shape, dtype=numpy.float32)
+        self.assertEqual(noise_coloured._eta.dtype, numpy.float32)
+        rng = numpy.random.RandomState(42)
+        eta = rng.normal(size=shape)
+        E = numpy.exp(-0.1 / 2.0)
+        for _ in range(3):
+            eta = eta * E + numpy.sqrt(1.0 - E ** 2) * rng.normal(size=shape)
+            generated = noise_coloured.generate(shape)
+            self.assertEqual(generated.dtype, numpy.float32)
+            numpy.testing.assert_allclose(generated, 0.1 * numpy.sqrt(0.5) * eta, rtol=1e-5, atol=1e-6)
     
 def suite():
     """
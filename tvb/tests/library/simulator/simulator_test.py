@@ -46,12 +46,13 @@ if True or __name__ == "__main__":
     setup_test_console_env()
 
 import os
+import copy
 import numpy
 import unittest
 import itertools
 from tvb.simulator.common import get_logger
 from tvb.simulator import simulator, models, coupling, integrators, monitors, noise
-from tvb.datatypes import connectivity, sensors
+from tvb.datatypes import connectivity
 from tvb.datatypes.cortex import Cortex
 from tvb.datatypes.local_connectivity import LocalConnectivity
 from tvb.datatypes.region_mapping import RegionMapping
@@ -60,13 +61,30 @@ from tvb.tests.library.base_testcase import BaseTestCase
 
 LOG = get_logger(__name__)
 
-sens_meg = sensors.SensorsMEG(load_default=True)
-sens_eeg = sensors.SensorsEEG(load_default=True)
 AVAILABLE_MODELS = get_traited_subclasses(models.Model)
 AVAILABLE_METHODS = get_traited_subclasses(integrators.Integrator)
 MODEL_CLASSES = AVAILABLE_MODELS.values()
 METHOD_NAMES = AVAILABLE_METHODS.keys()
 METHOD_NAMES.append('RungeKutta4thOrderDeterministic')
+INTEGRATOR_CLASSES = dict((name, getattr(integrators, name)) for name in METHOD_NAMES)
+
+
+# Structural data read once per module and copied into each simulation
+_STRUCTURE = {}
+
+
+def _load_structure(default_connectivity):
+    "Copies of the connectivity and region mapping of the default or the 192 region dataset."
+    if default_connectivity not in _STRUCTURE:
+        if default_connectivity:
+            white_matter = connectivity.Connectivity(load_default=True)
+            region_mapping = RegionMapping.from_file(source_file="regionMapping_16k_76.txt")
+        else:
+            white_matter = connectivity.Connectivity.from_file(source_file="connectivity_192.zip")
+            region_mapping = RegionMapping.from_file(source_file="regionMapping_16k_192.txt")
+        _STRUCTURE[default_connectivity] = white_matter, region_mapping
+    return copy.deepcopy(_STRUCTURE[default_connectivity])
+
 
 
 class Simulator(object):
@@ -85,8 +103,6 @@ class Simulator(object):
         gavg    = monitors.GlobalAverage(period=2 ** -2)
         subsamp = monitors.SubSample(period=2 ** -2)
         tavg    = monitors.TemporalAverage(period=2 ** -2)
-        #spheeg  = monitors.SphericalEEG(sensors=sens_eeg, period=2 ** -2)
-        #sphmeg  = monitors.SphericalMEG(sensors=sens_meg, period=2 ** -2)
         # TODO test all monitors
         
         self.monitors = (raw, gavg, subsamp, tavg) 
@@ -98,31 +114,11 @@ class Simulator(object):
     def run_simulation(self, simulation_length=2 ** 2):
         """
         Test a simulator constructed with one of the <model>_<scheme> methods.
-        """
-
-        raw_data, gavg_data, subsamp_data, tavg_data = [], [], [], []
-        # spheeg_data, sphmeg_data = [], []
-
-        for raw, gavg, subsamp, tavg in self.sim(simulation_length=simulation_length):    
-
-            if not raw is None:
-                raw_data.append(raw)
-
-            if not gavg is None:
-                gavg_data.append(gavg)
 
-            if not subsamp is None:
-                subsamp_data.append(subsamp)
+        Returns the (time, data) arrays of each monitor, in monitor order.
+        """
+        return self.sim.run(simulation_length=simulation_length)
 
-            if not tavg is None:
-                tavg_data.append(tavg)
-                
-            # if not spheeg is None:
-            #     spheeg_data.append(spheeg)
-                
-            # if not sphmeg is None:
-            #     sphmeg_data.append(sphmeg)
-                
 
     def configure(self, dt=2 ** -3, model=models.Generic2dOscillator, speed=4.0,
                   coupling_strength=0.00042, method="HeunDeterministic", 
@@ -136,13 +132,7 @@ class Simulator(object):
         """
         self.method = method
         
-        if default_connectivity:
-            white_matter = connectivity.Connectivity(load_default=True)
-            region_mapping = RegionMapping.from_file(source_file="regionMapping_16k_76.txt")
-        else:
-            white_matter = connectivity.Connectivity.from_file(source_file="connectivity_192.zip")
-            region_mapping = RegionMapping.from_file(source_file="regionMapping_16k_192.txt")
-
+        white_matter, region_mapping = _load_structure(default_connectivity)
 
         white_matter_coupling = coupling.Linear(a=coupling_strength)    
         white_matter.speed = speed
@@ -151,9 +141,9 @@ class Simulator(object):
         
         if method[-10:] == "Stochastic":
             hisss = noise.Additive(nsig=numpy.array([2 ** -11]))
-            integrator = eval("integrators." + method + "(dt=dt, noise=hisss)")
+            integrator = INTEGRATOR_CLASSES[method](dt=dt, noise=hisss)
         else:
-            integrator = eval("integrators." + method + "(dt=dt)")
+            integrator = INTEGRATOR_CLASSES[method](dt=dt)
         
         if surface_sim:
             local_coupling_strength = numpy.array([2 ** -10])
@@ -177,18 +167,6 @@ class Simulator(object):
 
 class SimulatorTest(BaseTestCase):
 
-    def test_simulator_region(self):
-        #init
-        test_simulator = Simulator()
-    
-        #test cases
-        for model_class, method_name in itertools.product(MODEL_CLASSES, METHOD_NAMES):
-            test_simulator.configure(model=model_class,
-                                     method=method_name,
-                                     surface_sim=False)
-            test_simulator.run_simulation()
-            
-            
     def test_simulator_surface(self): 
         """
         This test mainly evaluates if surface simulations run when
@@ -199,7 +177,6 @@ class SimulatorTest(BaseTestCase):
 
         """
         test_simulator = Simulator()
-
         for default_connectivity in [True, False]:
             test_simulator.configure(surface_sim=True, default_connectivity=default_connectivity)
             test_simulator.run_simulation(simulation_length=2)
@@ -207,6 +184,42 @@ class SimulatorTest(BaseTestCase):
 
 
 
+def _region_test(model_class, method_name):
+    "Build the region simulation test of one model and integration method."
+    def test(self):
+        test_simulator = Simulator()
+        test_simulator.configure(model=model_class,
+                                 method=method_name,
+                                 surface_sim=False)
+        test_simulator.run_simulation()
+    test.__name__ = 'test_simulator_region_%s_%s' % (model_class.__name__, method_name)
+    return test
+
+
+def _estimated_cost(case):
+    "Rough relative run time of a region test case."
+    model_class, method_name = case
+    cost = len(model_class.state_variables) * model_class.number_of_modes
+    if method_name.startswith(('Dop', 'VODE')):
+        cost *= 4  # SciPy ODE solvers, stepped through Python callbacks
+    if method_name.endswith('Stochastic'):
+        cost *= 2
+    return cost
+
+
+# Most expensive cases first, so that parallel workers finish together
+CASES = sorted(itertools.product(MODEL_CLASSES, METHOD_NAMES), key=_estimated_cost, reverse=True)
+
+# One test per model and method, so that a failure names its case and the
+# cases can be distributed over processes (e.g. pytest -n auto with xdist).
+# Test loaders sort methods by name, hence the rank prefix.
+for _rank, (_model_class, _method_name) in enumerate(CASES):
+    _test = _region_test(_model_class, _method_name)
+    _test.__name__ = _test.__name__.replace('region_', 'region_%03d_' % _rank, 1)
+    setattr(SimulatorTest, _test.__name__, _test)
+
+
+
 def suite():
     """
     Gather all the tests in a test suite.